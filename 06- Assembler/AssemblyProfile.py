@@ -0,0 +1,99 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import contextlib
+import time
+import typing
+
+
+class AssemblyProfile:
+    """Collects the time spent in each phase of the assembler, and counters
+    describing the assembled program.
+
+    Phases recorded by the assembler:
+    - "label_pass": the pass over the commands, which parses them, binds
+      the labels and encodes the A-commands.
+    - "c_encoding": encoding the C-commands, which are collected by the
+      label pass and encoded after it in one batch.
+    - "symbol_resolution": patching forward references and allocating
+      variables.
+    - "write": formatting and writing the output.
+    - "incremental": a whole incremental reassembly.
+
+    The phases don't overlap.
+
+    Counters recorded by the assembler:
+    - "instructions", "labels", "fixups", and "c_commands" for the number
+      of C-commands.
+    - "variables": variables allocated by the RAM[16] onwards allocator.
+    - "symbol_table_size": all symbols, predefined ones included.
+    - "cache_hits", "incremental_encoded".
+    """
+
+    def __init__(self) -> None:
+        self.times = {}
+        self.counts = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """Adds the time spent in the with block to the given phase.
+
+        Args:
+            name (str): the name of the phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """
+        Args:
+            name (str): the name of the phase.
+            seconds (float): time to add to the phase.
+        """
+        self.times[name] = self.times.get(name, 0.0) + seconds
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Args:
+            name (str): the name of the counter.
+            amount (int): the value to add to the counter.
+        """
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def merge(self, other: "AssemblyProfile") -> None:
+        """Adds the times and counters of another profile to this one.
+
+        Args:
+            other (AssemblyProfile): the profile to add.
+        """
+        for name, seconds in other.times.items():
+            self.add_time(name, seconds)
+        for name, amount in other.counts.items():
+            self.count(name, amount)
+
+    def as_dict(self) -> typing.Dict[str, typing.Dict[str, float]]:
+        """
+        Returns:
+            typing.Dict[str, typing.Dict[str, float]]: the phase times, in
+            seconds, under "times" and the counters under "counts".
+        """
+        return {"times": dict(self.times), "counts": dict(self.counts)}
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: a human readable table of the profile.
+        """
+        lines = []
+        for name, seconds in self.times.items():
+            lines.append("  {:<20} {:>10.3f} ms".format(name, seconds * 1000))
+        for name, amount in self.counts.items():
+            lines.append("  {:<20} {:>10}".format(name, amount))
+        return "\n".join(lines)
@@ -0,0 +1,256 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import typing
+from Code import Code
+from Main import ASSEMBLER_VERSION, encode_commands, resolve_fixups, \
+    write_words
+from Parser import Parser
+from SymbolTable import SymbolTable
+
+PHASES = ("parse", "encode", "symbols", "write")
+
+
+def generate_program(output_file: typing.TextIO, lines: int,
+                     label_density: float, variable_density: float,
+                     seed: int = 0) -> None:
+    """Writes a synthetic assembly program.
+
+    About half of the instructions are A-commands. These refer to variables,
+    to labels (both backward and forward), to predefined symbols or to
+    constants. The rest are C-commands drawn from all valid encodings.
+
+    Args:
+        output_file (typing.TextIO): writes the program to this file.
+        lines (int): the number of commands in the program.
+        label_density (float): the fraction of commands that are labels.
+        variable_density (float): the fraction of A-commands that refer to
+            a variable.
+        seed (int): seed of the random generator.
+    """
+    rand = random.Random(seed)
+    c_instructions = sorted(Code.C_INSTRUCTIONS)
+    predefined = sorted(SymbolTable.PREDEFINED)
+    label_count = max(1, int(lines * label_density))
+    variable_count = max(1, int(lines * variable_density / 20))
+    next_label = 0
+    chunk = []
+    for line in range(lines):
+        choice = rand.random()
+        if choice < label_density and next_label < label_count:
+            chunk.append("(LABEL" + str(next_label) + ")")
+            next_label += 1
+        elif choice < 0.5:
+            choice = rand.random()
+            if choice < variable_density:
+                chunk.append("@var" + str(rand.randrange(variable_count)))
+            elif choice < variable_density + (1 - variable_density) / 2:
+                chunk.append("@LABEL" + str(rand.randrange(label_count)))
+            elif rand.random() < 0.5:
+                chunk.append("@" + rand.choice(predefined))
+            else:
+                chunk.append("@" + str(rand.randrange(32768)))
+        else:
+            chunk.append(rand.choice(c_instructions))
+        if len(chunk) == 4096:
+            output_file.write("\n".join(chunk) + "\n")
+            chunk = []
+    # labels that were not placed yet are bound at the end of the program
+    chunk.extend("(LABEL" + str(label) + ")"
+                 for label in range(next_label, label_count))
+    output_file.write("\n".join(chunk) + "\n")
+
+
+def peak_rss() -> int:
+    """
+    Returns:
+        int: the peak resident set size of this process, in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def time_assembly(input_path: str, output_path: str) \
+        -> typing.Dict[str, float]:
+    """Assembles a file once, timing each phase separately.
+
+    Parsing is streamed into the encoding pass, so the file is first parsed
+    on its own to time the parse phase, and the encode phase is the time of
+    the streaming pass minus that.
+
+    Args:
+        input_path (str): the program to assemble.
+        output_path (str): where to write the output.
+
+    Returns:
+        typing.Dict[str, float]: the duration of every phase, in seconds.
+    """
+    timings = {}
+    with open(input_path, 'r') as input_file:
+        start = time.perf_counter()
+        for _ in Parser.iter_commands(input_file):
+            pass
+        timings["parse"] = time.perf_counter() - start
+    with open(input_path, 'r') as input_file, \
+            open(output_path, 'w') as output_file:
+        symbols = SymbolTable()
+        start = time.perf_counter()
+        words, fixups = encode_commands(
+            Parser.iter_commands(input_file), symbols)
+        timings["encode"] = max(
+            0.0, time.perf_counter() - start - timings["parse"])
+        start = time.perf_counter()
+        resolve_fixups(words, fixups, symbols)
+        timings["symbols"] = time.perf_counter() - start
+        start = time.perf_counter()
+        write_words(words, output_file)
+        timings["write"] = time.perf_counter() - start
+    return timings
+
+
+def run_case(input_path: str, repeat: int) -> typing.Dict[str, typing.Any]:
+    """Benchmarks the assembly of a single program.
+
+    Meant to run in a fresh process, so that the reported peak RSS belongs
+    to this program alone.
+
+    Args:
+        input_path (str): the program to assemble.
+        repeat (int): the number of times to assemble it. The fastest time
+            of each phase is reported.
+
+    Returns:
+        typing.Dict[str, typing.Any]: the results of the case.
+    """
+    best = dict.fromkeys(PHASES, float("inf"))
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_path = os.path.join(output_dir, "out.hack")
+        for _ in range(repeat):
+            timings = time_assembly(input_path, output_path)
+            for phase in PHASES:
+                best[phase] = min(best[phase], timings[phase])
+    with open(input_path, 'r') as input_file:
+        lines = sum(1 for _ in input_file)
+    total = sum(best.values())
+    return {
+        "lines": lines,
+        "seconds": total,
+        "lines_per_second": lines / total if total else 0.0,
+        "phases": best,
+        "peak_rss_bytes": peak_rss(),
+    }
+
+
+def run_benchmark(sizes: typing.List[int], label_density: float,
+                  variable_density: float, repeat: int, seed: int) \
+        -> typing.Dict[str, typing.Any]:
+    """Generates and assembles a synthetic program of every given size.
+
+    Args:
+        sizes (typing.List[int]): the number of lines of each program.
+        label_density (float): see generate_program.
+        variable_density (float): see generate_program.
+        repeat (int): the number of runs of each case.
+        seed (int): seed of the program generator.
+
+    Returns:
+        typing.Dict[str, typing.Any]: the results, ready to be saved as JSON.
+    """
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            input_path = os.path.join(work_dir, str(size) + ".asm")
+            with open(input_path, 'w') as program:
+                generate_program(program, size, label_density,
+                                 variable_density, seed)
+            with context.Pool(1) as pool:
+                result = pool.apply(run_case, (input_path, repeat))
+            os.remove(input_path)
+            results.append(result)
+            print_result(result)
+    return {
+        "assembler_version": ASSEMBLER_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "parameters": {
+            "label_density": label_density,
+            "variable_density": variable_density,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def print_result(result: typing.Dict[str, typing.Any],
+                 baseline: typing.Optional[typing.Dict[str, typing.Any]]
+                 = None) -> None:
+    """Prints a single line summarizing a case.
+
+    Args:
+        result (typing.Dict[str, typing.Any]): the results of the case.
+        baseline (typing.Dict[str, typing.Any]): if given, the results of
+            the same case in an earlier run, to compare against.
+    """
+    phases = " ".join(phase + "=" + format(result["phases"][phase], ".3f")
+                      + "s" for phase in PHASES)
+    line = "{:>10} lines {:>12,.0f} lines/s  peak {:>7.1f} MiB  {}".format(
+        result["lines"], result["lines_per_second"],
+        result["peak_rss_bytes"] / 2 ** 20, phases)
+    if baseline is not None and baseline["seconds"]:
+        line += "  ({:+.1%} vs baseline)".format(
+            result["seconds"] / baseline["seconds"] - 1)
+    print(line)
+
+
+if "__main__" == __name__:
+    arg_parser = argparse.ArgumentParser(
+        prog="Benchmark",
+        description="Measures the throughput of the assembler on "
+                    "synthetic programs.")
+    arg_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+        help="number of lines of each program")
+    arg_parser.add_argument(
+        "--label-density", type=float, default=0.05,
+        help="fraction of lines that are labels (default: 0.05)")
+    arg_parser.add_argument(
+        "--variable-density", type=float, default=0.2,
+        help="fraction of A-commands that use variables (default: 0.2)")
+    arg_parser.add_argument("--repeat", type=int, default=3,
+                            help="runs per program, the best is reported")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", help="save the results as JSON")
+    arg_parser.add_argument(
+        "--compare", help="JSON results of an earlier run to compare with")
+    args = arg_parser.parse_args()
+    report = run_benchmark(args.sizes, args.label_density,
+                           args.variable_density, args.repeat, args.seed)
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            baselines = {result["lines"]: result
+                         for result in json.load(baseline_file)["results"]}
+        print("compared with " + args.compare + ":")
+        for result in report["results"]:
+            if result["lines"] in baselines:
+                print_result(result, baselines[result["lines"]])
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
@@ -0,0 +1,125 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from Code import Code
+
+
+class BuildCache:
+    """A content-addressed cache of assembler outputs.
+
+    Outputs are stored in a local directory under the hash of everything that
+    determines them: the assembler version, the instruction tables of Code
+    (including the extended shift opcodes), the output format and the source
+    itself. Entries are evicted in least recently used order once the cache
+    grows beyond its size cap.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, version: str) -> None:
+        """
+        Args:
+            cache_dir (str): the directory holding the cached outputs. It is
+                created if it does not exist.
+            max_bytes (int): the size cap of the cache, in bytes.
+            version (str): the version of the assembler.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        tables = repr([sorted(table.items())
+                       for table in (Code.COMP, Code.DEST, Code.JUMP)])
+        self.salt = (version + "\0" + tables + "\0").encode()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, source: bytes, binary: bool) -> str:
+        """
+        Args:
+            source (bytes): the contents of the .asm file.
+            binary (bool): True if the output is a .hackb image.
+
+        Returns:
+            str: the cache key of the output.
+        """
+        digest = hashlib.sha256(self.salt)
+        digest.update(b"hackb\0" if binary else b"hack\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        """
+        Args:
+            key (str): a cache key.
+
+        Returns:
+            str: the path at which the output of the given key is stored.
+        """
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str, output_path: str) -> bool:
+        """Copies a cached output to the given path, if there is one.
+
+        Args:
+            key (str): the cache key of the output.
+            output_path (str): where to write the output.
+
+        Returns:
+            bool: True if the output was cached, False otherwise.
+        """
+        entry_path = self.entry_path(key)
+        try:
+            shutil.copyfile(entry_path, output_path)
+            # the modification time orders entries for eviction
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key: str, output_path: str) -> None:
+        """Stores an output in the cache.
+
+        Args:
+            key (str): the cache key of the output.
+            output_path (str): the path of the output to store.
+        """
+        entry_path = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        # writes to a temporary file first, so that concurrent readers never
+        # see a partial entry
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path))
+        os.close(handle)
+        try:
+            shutil.copyfile(output_path, temp_path)
+            os.replace(temp_path, entry_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def evict(self) -> None:
+        """Removes least recently used entries until the cache fits its
+        size cap."""
+        entries = []
+        total = 0
+        for directory, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
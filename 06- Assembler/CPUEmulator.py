@@ -0,0 +1,514 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import typing
+from array import array
+from Code import Code
+from HackBinary import HackBinary
+from Main import assemble
+from Screen import Screen
+
+
+class Halt(Exception):
+    """Raised by a handler to stop the emulator."""
+
+
+class Breakpoint(Exception):
+    """Raised by the handler of a breakpoint to stop the emulator before
+    the instruction."""
+
+
+class CPUEmulator:
+    """Executes Hack machine code.
+
+    Every ROM word is decoded once, when the program is loaded, into a
+    handler: a function that takes the program counter and the A and D
+    registers, executes that single instruction and returns their new
+    values. The handlers of C-instructions are generated as Python source
+    and compiled, so for example "AM=M-1" becomes a function that reads the
+    RAM, subtracts, wraps the result to 16 bits and stores it, without
+    decoding any bits while the program runs. Handlers are cached by the
+    word, so all the addresses holding the same instruction share one.
+
+    The RAM is an array of signed 16-bit words, and so are the registers.
+    C-instructions that do not start with 111 are the extended shifts of
+    Code.COMP, where shifting right keeps the sign bit. The jump target is
+    the value A had before the instruction.
+
+    A program halts when it reaches the "(END) @END 0;JMP" idiom, an
+    unconditional jump back to an A-instruction that loads its own address,
+    or when it runs past the end of its code.
+
+    run_blocks executes the program a basic block at a time instead: a run
+    of instructions that ends with a jump, or right before the address of a
+    label. Each block is compiled, the first time it is reached, into a
+    single Python function that keeps A and D in local variables. An
+    address that A is known to hold inside a block is used as a constant,
+    so for example "@SP" followed by "AM=M+1" becomes an update of ram[0].
+    Labels are not part of the machine code, so the addresses loaded by an
+    A-instruction right before a jump, or right before "D=A" (as a return
+    address is), are taken to be labels. Jumping to any other address works
+    as well, it just starts a new block there.
+
+    A breakpoint replaces the handler of its address with one that stops
+    run before the instruction, with at_breakpoint set. The next call of
+    run executes the instruction and continues. Blocks do not stop at
+    breakpoints.
+    """
+    ROM_SIZE = 32768
+    RAM_SIZE = 32768
+    # the largest number of instructions in a block
+    BLOCK_MAX_LENGTH = 256
+    LOAD_A_INTO_D = (Code.COMP["A"] << 6 | Code.DEST["D"] << 3) | 0x8000
+    # the mnemonic of every comp code, for readable handlers
+    COMP_MNEMONICS = {code: mnemonic for mnemonic, code in Code.COMP.items()}
+    JUMP_CONDITIONS = {
+        0b001: "out > 0", 0b010: "out == 0", 0b011: "out >= 0",
+        0b100: "out < 0", 0b101: "out != 0", 0b110: "out <= 0",
+    }
+
+    def __init__(self, words: typing.Sequence[int]) -> None:
+        """
+        Args:
+            words (typing.Sequence[int]): the instructions of the program,
+                such as those returned by assemble or HackBinary.load.
+        """
+        if len(words) > CPUEmulator.ROM_SIZE:
+            raise ValueError("The program does not fit in the ROM: " +
+                             str(len(words)) + " instructions")
+        self.rom = array("H", words)
+        self.ram = array("h", bytes(2 * CPUEmulator.RAM_SIZE))
+        self.pc = self.a = self.d = 0
+        self.halted = False
+        self.cycles = 0
+        self.handler_cache = {}
+        self.halt_addresses = set()
+        # the handlers replaced by breakpoints, by their addresses
+        self.breakpoints = {}
+        self.at_breakpoint = False
+        self.blocks = None
+        self.labels = None
+        self.handlers = [self.decode(address)
+                         for address in range(len(self.rom))]
+        self.handlers += [CPUEmulator.end_of_program] * \
+            (CPUEmulator.ROM_SIZE - len(self.handlers))
+
+    @staticmethod
+    def load(path: str) -> "CPUEmulator":
+        """
+        Args:
+            path (str): a .hack, .hackb or .asm file.
+
+        Returns:
+            CPUEmulator: an emulator with the program in its ROM.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".hackb":
+            return CPUEmulator(HackBinary.load(path))
+        with open(path, "r") as input_file:
+            if extension == ".asm":
+                return CPUEmulator(assemble(input_file)[0])
+            return CPUEmulator([int(line, 2) for line in input_file
+                                if line.strip()])
+
+    def reset(self) -> None:
+        """Restarts the program. The RAM is kept, like the reset input of
+        the Hack computer does."""
+        self.pc = self.a = self.d = 0
+        self.halted = False
+        self.at_breakpoint = False
+
+    def run(self, max_steps: typing.Optional[int] = None) -> int:
+        """
+        Args:
+            max_steps (typing.Optional[int]): the largest number of
+                instructions to execute, or None to run until the program
+                halts.
+
+        Returns:
+            int: the number of instructions executed.
+        """
+        handlers = self.handlers
+        pc, a, d = self.pc, self.a, self.d
+        limit = sys.maxsize if max_steps is None else max_steps
+        executed = 0
+        try:
+            if self.at_breakpoint and limit:
+                self.at_breakpoint = False
+                pc, a, d = self.breakpoints.get(pc, handlers[pc])(pc, a, d)
+                executed = 1
+            for executed in range(executed, limit):
+                pc, a, d = handlers[pc](pc, a, d)
+            else:
+                executed = limit
+        except Halt:
+            self.halted = True
+        except Breakpoint:
+            self.at_breakpoint = True
+        self.pc, self.a, self.d = pc, a, d
+        self.cycles += executed
+        return executed
+
+    def set_breakpoint(self, address: int) -> None:
+        """
+        Args:
+            address (int): the ROM address to stop at.
+        """
+        if address not in self.breakpoints:
+            self.breakpoints[address] = self.handlers[address]
+            self.handlers[address] = CPUEmulator.breakpoint_handler
+
+    def clear_breakpoint(self, address: int) -> None:
+        """
+        Args:
+            address (int): the ROM address of a breakpoint.
+        """
+        self.handlers[address] = self.breakpoints.pop(address)
+
+    def run_blocks(self, max_steps: typing.Optional[int] = None) -> int:
+        """Like run, but executes a compiled block at a time. The last
+        instructions before max_steps is reached are executed one by one.
+
+        Args:
+            max_steps (typing.Optional[int]): the largest number of
+                instructions to execute, or None to run until the program
+                halts.
+
+        Returns:
+            int: the number of instructions executed.
+        """
+        if self.blocks is None:
+            self.labels = self.find_labels()
+            self.blocks = [None] * CPUEmulator.ROM_SIZE
+        self.at_breakpoint = False
+        blocks = self.blocks
+        pc, a, d = self.pc, self.a, self.d
+        limit = sys.maxsize if max_steps is None else max_steps
+        executed = 0
+        try:
+            while True:
+                block = blocks[pc]
+                if block is None:
+                    block = blocks[pc] = self.compile_block(pc)
+                function, length = block
+                if executed + length > limit:
+                    break
+                pc, a, d = function(a, d)
+                executed += length
+        except Halt:
+            self.halted = True
+        self.pc, self.a, self.d = pc, a, d
+        self.cycles += executed
+        if not self.halted and executed < limit:
+            executed += self.run(limit - executed)
+        return executed
+
+    def decode(self, address: int) -> typing.Callable:
+        """
+        Args:
+            address (int): the ROM address of an instruction.
+
+        Returns:
+            typing.Callable: the handler of the instruction.
+        """
+        word = self.rom[address]
+        # an unconditional jump without a destination after "@address-1"
+        if address > 0 and word & 0x8000 and word & 0b111111 == 0b111 and \
+                self.rom[address - 1] == address - 1:
+            self.halt_addresses.add(address)
+            return CPUEmulator.halt_handler(address - 1)
+        handler = self.handler_cache.get(word)
+        if handler is None:
+            handler = self.compile_handler(word)
+            self.handler_cache[word] = handler
+        return handler
+
+    def compile_handler(self, word: int) -> typing.Callable:
+        """
+        Args:
+            word (int): an instruction.
+
+        Returns:
+            typing.Callable: a function executing the instruction.
+        """
+        if not word & 0x8000:
+            return CPUEmulator.load_handler(word)
+        namespace = {"ram": self.ram}
+        exec(CPUEmulator.handler_source(word), namespace)
+        return namespace["handler"]
+
+    def find_labels(self) -> typing.Set[int]:
+        """
+        Returns:
+            typing.Set[int]: the addresses that start a block: the address
+            after every jump and the addresses that are taken to be labels.
+        """
+        rom = self.rom
+        labels = set(self.halt_addresses)
+        for address, word in enumerate(rom):
+            if word & 0x8000:
+                if word & 0b111:
+                    labels.add(address + 1)
+            elif word < len(rom) and address + 1 < len(rom) and \
+                    (rom[address + 1] & 0x8007 > 0x8000 or
+                     rom[address + 1] == CPUEmulator.LOAD_A_INTO_D):
+                labels.add(word)
+        return labels
+
+    def compile_block(self, start: int) -> typing.Tuple[typing.Callable, int]:
+        """
+        Args:
+            start (int): the address the block starts at.
+
+        Returns:
+            typing.Tuple[typing.Callable, int]: a function taking A and D,
+            which executes the block and returns the next address and the
+            new A and D, and the number of instructions in the block.
+        """
+        if start >= len(self.rom) or start in self.halt_addresses:
+            # halting jumps and the end of the program raise Halt before
+            # changing the registers, so they are executed on their own
+            handler = self.breakpoints.get(start, self.handlers[start])
+            return (lambda a, d: handler(start, a, d)), 1
+        end = start
+        while end < len(self.rom) and end - start < \
+                CPUEmulator.BLOCK_MAX_LENGTH and (end == start or (
+                    end not in self.labels and
+                    end not in self.halt_addresses)):
+            end += 1
+            if self.rom[end - 1] & 0x8007 > 0x8000:
+                break
+        namespace = {"ram": self.ram}
+        exec(CPUEmulator.block_source(self.rom[start:end], start), namespace)
+        return namespace["block"], end - start
+
+    @staticmethod
+    def block_source(words: typing.Sequence[int], start: int) -> str:
+        """
+        Args:
+            words (typing.Sequence[int]): the instructions of a block, of
+                which only the last one may jump.
+            start (int): the address of the first instruction.
+
+        Returns:
+            str: the source of a function named block executing them.
+        """
+        lines = ["def block(a, d):"]
+        # the value of A if it was loaded by an A-instruction of the block
+        a_value = None
+        for word in words:
+            if not word & 0x8000:
+                a_value = word
+                continue
+            a_source = "a" if a_value is None else str(a_value)
+            address = "a & 32767" if a_value is None else a_source
+            expression, wraps = CPUEmulator.comp_expression(
+                (word >> 6) & 0x3FF)
+            expression = re.sub(r"\b[am]\b", lambda match: a_source if
+                                match.group() == "a" else
+                                "ram[" + address + "]", expression)
+            if wraps:
+                expression = "((" + expression + ") + 32768 & 65535) - 32768"
+            dest = (word >> 3) & 0b111
+            jump = word & 0b111
+            if jump and dest & 0b100 and a_value is None:
+                lines.append("    target = a & 32767")
+                address = "target"
+            targets = []
+            if dest & 0b001:
+                targets.append("ram[" + address + "]")
+            if dest & 0b100:
+                # assigned last, as the address of M is read from a
+                targets.append("a")
+                a_value = None
+            if dest & 0b010:
+                targets.insert(0, "d")
+            if jump:
+                targets.insert(0, "out")
+            lines.append("    " + " = ".join(targets + [expression]))
+            if jump:
+                registers = ", " + ("a" if a_value is None else str(a_value)) \
+                    + ", d"
+                if jump != 0b111:
+                    lines.append("    if " +
+                                 CPUEmulator.JUMP_CONDITIONS[jump] + ":")
+                    lines.append("        return " + address + registers)
+                    lines.append("    return " +
+                                 str(start + len(words)) + registers)
+                else:
+                    lines.append("    return " + address + registers)
+                return "\n".join(lines) + "\n"
+        lines.append("    return " + str(start + len(words)) + ", " +
+                     ("a" if a_value is None else str(a_value)) + ", d")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def handler_source(word: int) -> str:
+        """
+        Args:
+            word (int): a C-instruction.
+
+        Returns:
+            str: the source of a function named handler executing it.
+        """
+        comp = (word >> 6) & 0x3FF
+        dest = (word >> 3) & 0b111
+        jump = word & 0b111
+        expression, wraps = CPUEmulator.comp_expression(comp)
+        lines = ["def handler(pc, a, d):"]
+        if "m" in expression:
+            lines.append("    m = ram[a & 32767]")
+        if wraps:
+            lines.append("    out = ((" + expression +
+                         ") + 32768 & 65535) - 32768")
+        else:
+            lines.append("    out = " + expression)
+        if dest & 0b001:
+            lines.append("    ram[a & 32767] = out")
+        registers = ("out" if dest & 0b100 else "a") + ", " + \
+            ("out" if dest & 0b010 else "d")
+        if jump == 0b111:
+            lines.append("    return a & 32767, " + registers)
+        else:
+            if jump:
+                lines.append("    if " + CPUEmulator.JUMP_CONDITIONS[jump] +
+                             ":")
+                lines.append("        return a & 32767, " + registers)
+            lines.append("    return pc + 1, " + registers)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def comp_expression(comp: int) -> typing.Tuple[str, bool]:
+        """
+        Args:
+            comp (int): the 10 bit comp code of a C-instruction.
+
+        Returns:
+            typing.Tuple[str, bool]: a Python expression of d, a and m
+            computing the result, and True if the result has to be wrapped
+            to 16 bits.
+        """
+        mnemonic = CPUEmulator.COMP_MNEMONICS.get(comp)
+        if mnemonic is not None:
+            expression = mnemonic.replace("<<", " << 1").replace(
+                ">>", " >> 1").replace("!", "~")
+            if len(expression) == 3:
+                expression = " ".join(expression)
+            wraps = "<<" in expression or "+" in expression or \
+                ("-" in expression and expression != "-1")
+            return expression.lower(), wraps
+        y = "m" if comp & 0b1000000 else "a"
+        if comp >> 7 != 0b111:
+            # the shifts of the extended ALU: bit 5 selects the direction,
+            # bit 4 selects D over A or M
+            operand = "d" if comp & 0b10000 else y
+            if comp & 0b100000:
+                return operand + " << 1", True
+            return operand + " >> 1", False
+        # any other combination of the ALU control bits
+        x = "0" if comp & 0b100000 else "d"
+        if comp & 0b10000:
+            x = "~" + x
+        if comp & 0b1000:
+            y = "0"
+        if comp & 0b100:
+            y = "~" + y
+        expression = "(" + x + (") + (" if comp & 0b10 else ") & (") + y + ")"
+        if comp & 0b1:
+            expression = "~(" + expression + ")"
+        return expression, bool(comp & 0b10)
+
+    @staticmethod
+    def load_handler(value: int) -> typing.Callable:
+        """
+        Args:
+            value (int): the value of an A-instruction.
+
+        Returns:
+            typing.Callable: a function executing the instruction.
+        """
+        def handler(pc, a, d):
+            return pc + 1, value, d
+
+        return handler
+
+    @staticmethod
+    def halt_handler(address: int) -> typing.Callable:
+        """
+        Args:
+            address (int): the address of an A-instruction loading its own
+                address, which is followed by an unconditional jump.
+
+        Returns:
+            typing.Callable: a handler of the jump that halts if it jumps
+            back to the A-instruction.
+        """
+        def handler(pc, a, d):
+            if a == address:
+                raise Halt()
+            return a & 32767, a, d
+
+        return handler
+
+    @staticmethod
+    def breakpoint_handler(pc: int, a: int, d: int) -> None:
+        """The handler of the addresses of breakpoints."""
+        raise Breakpoint()
+
+    @staticmethod
+    def end_of_program(pc: int, a: int, d: int) -> None:
+        """The handler of the addresses after the program."""
+        raise Halt()
+
+
+if "__main__" == __name__:
+    arg_parser = argparse.ArgumentParser(prog="CPUEmulator")
+    arg_parser.add_argument("path", help="a .hack, .hackb or .asm file")
+    arg_parser.add_argument(
+        "--steps", type=int,
+        help="the largest number of instructions to execute")
+    arg_parser.add_argument(
+        "--set", nargs="*", default=[], metavar="ADDRESS=VALUE",
+        help="RAM words to set before running")
+    arg_parser.add_argument(
+        "--show", nargs="*", type=int, default=[], metavar="ADDRESS",
+        help="RAM words to print after running")
+    arg_parser.add_argument(
+        "--blocks", action="store_true",
+        help="compile and execute basic blocks instead of single "
+             "instructions")
+    arg_parser.add_argument(
+        "--screen", metavar="IMAGE",
+        help="write the screen to a .png or .pgm image after running "
+             "(requires NumPy)")
+    args = arg_parser.parse_args()
+    emulator = CPUEmulator.load(os.path.abspath(args.path))
+    for assignment in args.set:
+        address, _, value = assignment.partition("=")
+        emulator.ram[int(address)] = int(value)
+    start = time.perf_counter()
+    if args.blocks:
+        executed = emulator.run_blocks(args.steps)
+    else:
+        executed = emulator.run(args.steps)
+    seconds = time.perf_counter() - start
+    print(("halted" if emulator.halted else "stopped") + " after " +
+          str(executed) + " instructions in " + format(seconds, ".3f") +
+          " s (" + format(executed / max(seconds, 1e-9), ",.0f") +
+          " instructions per second)")
+    for address in args.show:
+        print("RAM[" + str(address) + "] = " + str(emulator.ram[address]))
+    if args.screen:
+        if args.screen.lower().endswith(".pgm"):
+            Screen(emulator.ram).write_pgm(args.screen)
+        else:
+            Screen(emulator.ram).write_png(args.screen)
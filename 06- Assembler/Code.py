@@ -5,97 +5,162 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import itertools
 
 
 class Code:
-    """Translates Hack assembly language mnemonics into binary codes."""
+    """Translates Hack assembly language mnemonics into binary codes.
+
+    Codes are integers: a C-instruction word is
+    ``(comp << 6) | (dest << 3) | jump``.
+    """
+    DEST = {
+        "null": 0b000,
+        "M": 0b001,
+        "D": 0b010,
+        "MD": 0b011,
+        "A": 0b100,
+        "AM": 0b101,
+        "AD": 0b110,
+        "AMD": 0b111
+    }
+
+    # The three most significant bits are part of the comp code, so the
+    # extended shift instructions (which start with 101 instead of 111) need
+    # no special handling.
+    COMP = {
+        "0": 0b1110101010,
+        "1": 0b1110111111,
+        "-1": 0b1110111010,
+        "D": 0b1110001100,
+        "A": 0b1110110000,
+        "M": 0b1111110000,
+        "!D": 0b1110001101,
+        "!A": 0b1110110001,
+        "!M": 0b1111110001,
+        "-D": 0b1110001111,
+        "-A": 0b1110110011,
+        "-M": 0b1111110011,
+        "D+1": 0b1110011111,
+        "A+1": 0b1110110111,
+        "M+1": 0b1111110111,
+        "D-1": 0b1110001110,
+        "A-1": 0b1110110010,
+        "M-1": 0b1111110010,
+        "D+A": 0b1110000010,
+        "D+M": 0b1111000010,
+        "D-A": 0b1110010011,
+        "D-M": 0b1111010011,
+        "A-D": 0b1110000111,
+        "M-D": 0b1111000111,
+        "D&A": 0b1110000000,
+        "D&M": 0b1111000000,
+        "D|A": 0b1110010101,
+        "D|M": 0b1111010101,
+        "A<<": 0b1010100000,
+        "D<<": 0b1010110000,
+        "M<<": 0b1011100000,
+        "A>>": 0b1010000000,
+        "D>>": 0b1010010000,
+        "M>>": 0b1011000000,
+    }
+
+    # Operators whose operands may be written in either order, e.g. "M+D".
+    COMMUTATIVE = "+&|"
+
+    JUMP = {
+        "null": 0b000,
+        "JGT": 0b001,
+        "JEQ": 0b010,
+        "JGE": 0b011,
+        "JLT": 0b100,
+        "JNE": 0b101,
+        "JLE": 0b110,
+        "JMP": 0b111
+    }
+
+    # Encoded C-instructions, keyed by their full text ("dest=comp;jump").
+    # Holds every canonical spelling, and is extended with other spellings
+    # (such as "DM=D+M") the first time they are encoded.
+    C_INSTRUCTIONS = {
+        ("" if dest == "null" else dest + "=") + comp +
+        ("" if jump == "null" else ";" + jump):
+            (comp_code << 6) | (dest_code << 3) | jump_code
+        for (dest, dest_code), (comp, comp_code), (jump, jump_code)
+        in itertools.product(DEST.items(), COMP.items(), JUMP.items())
+    }
+
     @staticmethod
-    def dest(mnemonic: str) -> str:
+    def dest(mnemonic: str) -> int:
         """
         Args:
             mnemonic (str): a dest mnemonic string.
         Returns:
-            str: 3-bit long binary code of the given mnemonic.
+            int: 3-bit code of the given mnemonic.
         """
-        dest = {
-            "null": "000",
-            "M": "001",
-            "D": "010",
-            "MD": "011",
-            "A": "100",
-            "AM": "101",
-            "AD": "110",
-            "AMD": "111"
-        }
-        mnemonic = mnemonic.strip()
-        return dest.get(mnemonic)
+        return Code.DEST.get(mnemonic.strip())
 
     @staticmethod
-    def comp(mnemonic: str) -> str:
+    def comp(mnemonic: str) -> int:
         """
         Args:
             mnemonic (str): a comp mnemonic string.
 
         Returns:
-            str: the binary code of the given mnemonic.
+            int: 10-bit code of the given mnemonic, including the three
+            leading bits of the instruction.
         """
-        comp = {
-            "0": "0101010",
-            "1": "0111111",
-            "-1": "0111010",
-            "D": "0001100",
-            "A": "0110000",
-            "M": "1110000",
-            "!D": "0001101",
-            "!A": "0110001",
-            "!M": "1110001",
-            "-D": "0001111",
-            "-A": "0110011",
-            "-M": "1110011",
-            "D+1": "0011111",
-            "A+1": "0110111",
-            "M+1": "1110111",
-            "D-1": "0001110",
-            "A-1": "0110010",
-            "M-1": "1110010",
-            "D+A": "0000010",
-            "D+M": "1000010",
-            "D-A": "0010011",
-            "D-M": "1010011",
-            "A-D": "0000111",
-            "M-D": "1000111",
-            "D&A": "0000000",
-            "D&M": "1000000",
-            "D|A": "0010101",
-            "D|M": "1010101",
-            "A<<": "1010100000",
-            "D<<": "1010110000",
-            "M<<": "1011100000",
-            "A>>": "1010000000",
-            "D>>": "1010010000",
-            "M>>": "1011000000",
-        }
-        mnemonic = mnemonic.strip()
-        return comp.get(mnemonic)
+        return Code.COMP.get(mnemonic.strip())
 
     @staticmethod
-    def jump(mnemonic: str) -> str:
+    def jump(mnemonic: str) -> int:
         """
         Args:
             mnemonic (str): a jump mnemonic string.
 
         Returns:
-            str: 3-bit long binary code of the given mnemonic.
+            int: 3-bit code of the given mnemonic.
+        """
+        return Code.JUMP.get(mnemonic.strip())
+
+    @staticmethod
+    def c_instruction(instruction: str) -> int:
+        """
+        Args:
+            instruction (str): a C-instruction, as written in the program.
+
+        Returns:
+            int: the 16-bit code of the given instruction.
+        """
+        word = Code.C_INSTRUCTIONS.get(instruction)
+        if word is None:
+            word = Code.encode_c_instruction(instruction)
+            Code.C_INSTRUCTIONS[instruction] = word
+        return word
+
+    @staticmethod
+    def encode_c_instruction(instruction: str) -> int:
+        """Encodes a C-instruction that is not in the lookup table yet.
+
+        Args:
+            instruction (str): a C-instruction, as written in the program.
+
+        Returns:
+            int: the 16-bit code of the given instruction.
         """
-        jump = {
-            "null": "000",
-            "JGT": "001",
-            "JEQ": "010",
-            "JGE": "011",
-            "JLT": "100",
-            "JNE": "101",
-            "JLE": "110",
-            "JMP": "111"
-        }
-        mnemonic = mnemonic.strip()
-        return jump.get(mnemonic)
+        text = "".join(instruction.split())
+        dest, equal, comp = text.rpartition("=")
+        comp, semicolon, jump = comp.partition(";")
+        # the dest registers may be listed in any order
+        if set(dest) <= set("AMD") and len(set(dest)) == len(dest):
+            dest = "".join(register for register in "AMD" if register in dest)
+        dest_code = Code.DEST.get(dest or "null")
+        comp_code = Code.COMP.get(comp)
+        if comp_code is None and len(comp) == 3 and \
+                comp[1] in Code.COMMUTATIVE:
+            comp_code = Code.COMP.get(comp[::-1])
+        jump_code = Code.JUMP.get(jump or "null")
+        if dest_code is None or comp_code is None or jump_code is None or \
+                (equal and not dest) or (semicolon and not jump):
+            raise ValueError("Invalid C-instruction: " + instruction)
+        return (comp_code << 6) | (dest_code << 3) | jump_code
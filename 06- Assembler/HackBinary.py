@@ -0,0 +1,100 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import mmap
+import os
+import struct
+import sys
+import typing
+import zlib
+from array import array
+
+
+class HackBinary:
+    """Reads and writes packed Hack ROM images (.hackb files).
+
+    A .hackb file is a header followed by the instruction words, stored as
+    little-endian 16-bit integers. The header holds, in order: the magic bytes
+    "HACK", the format version, a reserved field, the number of words, the
+    number of user-defined symbols of the program, and the CRC-32 of the
+    words.
+    """
+    MAGIC = b"HACK"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHIII")
+
+    @staticmethod
+    def write(words: array, symbol_count: int,
+              output_file: typing.BinaryIO) -> None:
+        """Writes a ROM image.
+
+        Args:
+            words (array): the encoded instructions, an array of type "H".
+            symbol_count (int): the number of labels and variables.
+            output_file (typing.BinaryIO): writes all output to this file.
+        """
+        if sys.byteorder == "big":
+            words = array("H", words)
+            words.byteswap()
+        payload = words.tobytes()
+        output_file.write(HackBinary.HEADER.pack(
+            HackBinary.MAGIC, HackBinary.VERSION, 0, len(words),
+            symbol_count, zlib.crc32(payload)))
+        output_file.write(payload)
+
+    @staticmethod
+    def read_header(image: typing.Union[bytes, memoryview, mmap.mmap]) \
+            -> typing.Tuple[int, int, int]:
+        """
+        Args:
+            image: the contents of a .hackb file.
+
+        Returns:
+            typing.Tuple[int, int, int]: the number of words, the number of
+            symbols and the checksum stored in the header.
+        """
+        if len(image) < HackBinary.HEADER.size:
+            raise ValueError("Not a .hackb file: the header is truncated")
+        magic, version, _, word_count, symbol_count, checksum = \
+            HackBinary.HEADER.unpack_from(image)
+        if magic != HackBinary.MAGIC:
+            raise ValueError("Not a .hackb file: bad magic bytes")
+        if version != HackBinary.VERSION:
+            raise ValueError("Unsupported .hackb version " + str(version))
+        if len(image) != HackBinary.HEADER.size + 2 * word_count:
+            raise ValueError("Corrupt .hackb file: size does not match header")
+        return word_count, symbol_count, checksum
+
+    @staticmethod
+    def load(path: str, verify: bool = True) -> memoryview:
+        """Maps a ROM image into memory.
+
+        On little-endian machines the returned view points directly into the
+        memory-mapped file, so no instruction is copied or parsed. Pages are
+        only read when they are accessed, unless verify is set.
+
+        Args:
+            path (str): the path of the .hackb file.
+            verify (bool): if this is True, the checksum is checked.
+
+        Returns:
+            memoryview: a read-only view of the instruction words, of
+            format "H".
+        """
+        with open(path, "rb") as input_file:
+            if os.fstat(input_file.fileno()).st_size == 0:
+                raise ValueError("Not a .hackb file: the file is empty")
+            image = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, checksum = HackBinary.read_header(image)
+        payload = memoryview(image)[HackBinary.HEADER.size:]
+        if verify and zlib.crc32(payload) != checksum:
+            raise ValueError("Corrupt .hackb file: checksum mismatch")
+        if sys.byteorder == "big":
+            words = array("H", payload.tobytes())
+            words.byteswap()
+            return memoryview(words).toreadonly()
+        return payload.cast("H")
@@ -0,0 +1,283 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import os
+import typing
+from array import array
+from Code import Code
+from Parser import Parser
+from SymbolTable import SymbolTable
+
+
+class IncrementalAssembler:
+    """Reassembles an edited program by re-encoding only what changed.
+
+    The commands, encoded instructions, labels and variables of the previous
+    run are kept in a state file. On the next run, the common prefix and
+    suffix of the old and new commands are found, and only the commands
+    between them are encoded. Label addresses are recomputed only if the
+    number of instructions or the labels in the edited range changed, and
+    variables are reallocated only if the edit touched a variable. Finally,
+    instructions outside the edited range are re-encoded only if they refer
+    to a symbol whose address moved.
+    """
+    STATE_VERSION = 1
+
+    def __init__(self, state_path: str) -> None:
+        """Loads the state of the previous run, if there is a usable one.
+
+        Args:
+            state_path (str): the path of the state file.
+        """
+        self.state_path = state_path
+        self.commands = None
+        self.words = None
+        self.labels = None
+        self.variables = None
+        # what the last call to assemble did, for reporting
+        self.stats = {}
+        try:
+            with open(state_path, 'r') as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return
+        if state.get("version") != IncrementalAssembler.STATE_VERSION:
+            return
+        self.commands = state["commands"]
+        self.words = array("H", bytes.fromhex(state["words"]))
+        self.labels = state["labels"]
+        self.variables = state["variables"]
+
+    def save(self) -> None:
+        """Writes the state of the last run to the state file."""
+        state = {
+            "version": IncrementalAssembler.STATE_VERSION,
+            "commands": self.commands,
+            "words": self.words.tobytes().hex(),
+            "labels": self.labels,
+            "variables": self.variables,
+        }
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, 'w') as state_file:
+            json.dump(state, state_file, separators=(",", ":"))
+        os.replace(temp_path, self.state_path)
+
+    def assemble(self, input_file: typing.TextIO) \
+            -> typing.Tuple[array, SymbolTable]:
+        """Assembles a file, reusing the previous run where possible.
+
+        Args:
+            input_file (typing.TextIO): the file to assemble.
+
+        Returns:
+            typing.Tuple[array, SymbolTable]: the encoded instructions, an
+            array of type "H", and the symbol table of the program.
+        """
+        commands = [command.text
+                    for command in Parser.iter_commands(input_file)]
+        if self.commands is None:
+            self.assemble_all(commands)
+        else:
+            self.assemble_changes(commands)
+        symbols = SymbolTable()
+        for symbol, address in self.labels.items():
+            symbols.add_entry(symbol, address)
+        for symbol, address in self.variables.items():
+            symbols.add_entry(symbol, address)
+        return self.words, symbols
+
+    def assemble_all(self, commands: typing.List[str]) -> None:
+        """Assembles every command, without a previous run.
+
+        Args:
+            commands (typing.List[str]): the commands of the program.
+        """
+        self.commands = commands
+        self.labels = IncrementalAssembler.find_labels(commands)
+        self.variables = IncrementalAssembler.find_variables(
+            commands, self.labels)
+        self.words = array("H", [
+            self.encode(command) for command in commands
+            if command[0] != '('])
+        self.stats = {"full": True, "encoded": len(self.words)}
+
+    def assemble_changes(self, commands: typing.List[str]) -> None:
+        """Assembles the commands that differ from the previous run.
+
+        Args:
+            commands (typing.List[str]): the commands of the program.
+        """
+        old_commands = self.commands
+        # the edited range is old_commands[start:old_end], which was
+        # replaced by commands[start:new_end]
+        limit = min(len(old_commands), len(commands))
+        start = 0
+        while start < limit and old_commands[start] == commands[start]:
+            start += 1
+        suffix = 0
+        while suffix < limit - start and \
+                old_commands[-1 - suffix] == commands[-1 - suffix]:
+            suffix += 1
+        old_end = len(old_commands) - suffix
+        new_end = len(commands) - suffix
+        old_range = old_commands[start:old_end]
+        new_range = commands[start:new_end]
+
+        old_labels, old_variables = self.labels, self.variables
+        old_instructions = IncrementalAssembler.count_instructions(old_range)
+        new_instructions = IncrementalAssembler.count_instructions(new_range)
+        labels_changed = old_instructions != new_instructions or any(
+            command[0] == '(' for command in old_range + new_range)
+        if labels_changed:
+            self.labels = IncrementalAssembler.find_labels(commands)
+        if self.labels.keys() != old_labels.keys() or any(
+                command[0] == '@' and command[1:] in old_variables
+                for command in old_range) or any(
+                IncrementalAssembler.is_variable(command, self.labels)
+                for command in new_range):
+            self.variables = IncrementalAssembler.find_variables(
+                commands, self.labels)
+
+        first_word = IncrementalAssembler.count_instructions(
+            commands[:start])
+        words = self.words[:first_word]
+        words.extend(self.encode(command) for command in new_range
+                     if command[0] != '(')
+        words.extend(self.words[first_word + old_instructions:])
+        self.words = words
+        self.commands = commands
+        encoded = new_instructions
+
+        moved = self.moved_symbols(old_labels, old_variables)
+        if moved:
+            index = 0
+            for position, command in enumerate(commands):
+                first = command[0]
+                if first == '(':
+                    continue
+                if first == '@' and command[1:] in moved and \
+                        not start <= position < new_end:
+                    words[index] = self.encode(command)
+                    encoded += 1
+                index += 1
+        self.stats = {"full": False, "encoded": encoded,
+                      "labels_recomputed": labels_changed,
+                      "variables_recomputed":
+                          self.variables is not old_variables}
+
+    def moved_symbols(self, old_labels: typing.Dict[str, int],
+                      old_variables: typing.Dict[str, int]) \
+            -> typing.Set[str]:
+        """
+        Args:
+            old_labels (typing.Dict[str, int]): the labels of the previous
+                run.
+            old_variables (typing.Dict[str, int]): the variables of the
+                previous run.
+
+        Returns:
+            typing.Set[str]: the user symbols whose address changed since
+            the previous run, or which were added or removed.
+        """
+        moved = set()
+        for old, new in ((old_labels, self.labels),
+                         (old_variables, self.variables)):
+            if old is new:
+                continue
+            moved.update(symbol for symbol, address in old.items()
+                         if new.get(symbol) != address)
+            moved.update(symbol for symbol in new if symbol not in old)
+        return moved
+
+    def encode(self, command: str) -> int:
+        """
+        Args:
+            command (str): an A-command or a C-command.
+
+        Returns:
+            int: the 16-bit code of the command.
+        """
+        if command[0] != '@':
+            return Code.c_instruction(command)
+        symbol = command[1:]
+        if symbol.isdecimal():
+            return int(symbol) & 0x7FFF
+        address = self.labels.get(symbol)
+        if address is None:
+            address = self.variables.get(symbol)
+            if address is None:
+                address = SymbolTable.PREDEFINED[symbol]
+        return address & 0x7FFF
+
+    @staticmethod
+    def count_instructions(commands: typing.List[str]) -> int:
+        """
+        Args:
+            commands (typing.List[str]): commands of the program.
+
+        Returns:
+            int: the number of commands that are not labels.
+        """
+        return sum(1 for command in commands if command[0] != '(')
+
+    @staticmethod
+    def find_labels(commands: typing.List[str]) -> typing.Dict[str, int]:
+        """
+        Args:
+            commands (typing.List[str]): the commands of the program.
+
+        Returns:
+            typing.Dict[str, int]: the address of every label.
+        """
+        labels = {}
+        address = 0
+        for command in commands:
+            if command[0] == '(':
+                labels[command[1:-1]] = address
+            else:
+                address += 1
+        return labels
+
+    @staticmethod
+    def is_variable(command: str, labels: typing.Dict[str, int]) -> bool:
+        """
+        Args:
+            command (str): a command of the program.
+            labels (typing.Dict[str, int]): the labels of the program.
+
+        Returns:
+            bool: True if the command is an A-command referring to a
+            variable, False otherwise.
+        """
+        if command[0] != '@':
+            return False
+        symbol = command[1:]
+        return not symbol.isdecimal() and symbol not in labels and \
+            symbol not in SymbolTable.PREDEFINED
+
+    @staticmethod
+    def find_variables(commands: typing.List[str],
+                       labels: typing.Dict[str, int]) -> typing.Dict[str, int]:
+        """Allocates the variables from RAM[16] onwards in order of first
+        use, like the regular assembler does.
+
+        Args:
+            commands (typing.List[str]): the commands of the program.
+            labels (typing.Dict[str, int]): the labels of the program.
+
+        Returns:
+            typing.Dict[str, int]: the address of every variable.
+        """
+        variables = {}
+        rom = 16
+        for command in commands:
+            if IncrementalAssembler.is_variable(command, labels) and \
+                    command[1:] not in variables:
+                variables[command[1:]] = rom
+                rom += 1
+        return variables
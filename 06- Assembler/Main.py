@@ -5,86 +5,311 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import contextlib
 import os
 import sys
 import typing
+from concurrent.futures import ProcessPoolExecutor
+from array import array
 from SymbolTable import SymbolTable
-from Parser import Parser
+from Parser import Command, Parser
 from Code import Code
+from HackBinary import HackBinary
+from BuildCache import BuildCache
+from Incremental import IncrementalAssembler
+from AssemblyProfile import AssemblyProfile
 
+# Part of the build cache key: change it whenever the output of the
+# assembler changes for the same input.
+ASSEMBLER_VERSION = "2.0"
 
-def deci_to_bin(deci: str):
-    """Translates decimal to binary
-        Args:
-            command string of decimal address/command etc
-            return string for the binary representation
-    """
-    a = int(deci)
-    bin_out = ""
-    for i in range(14, -1, -1):
-        b = pow(2, i)
-        if b <= a:
-            bin_out += "1"
-            a = a - b
-        else:
-            bin_out += "0"
-    return bin_out
 
-def assemble_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
-    """Assembles a single file.
+# The binary text of every byte value, used to format 16-bit words as two
+# table lookups instead of building each line bit by bit.
+BYTE_TO_BIN = [format(byte, "08b") for byte in range(256)]
+# Number of words that are formatted and written in a single write call.
+WRITE_CHUNK = 4096
+
+
+def assemble(input_file: typing.TextIO,
+             profile: typing.Optional[AssemblyProfile] = None) \
+        -> typing.Tuple[array, SymbolTable]:
+    """Assembles a single file in a single pass, reading it line by line.
+
+    Labels are bound as soon as they are read. A-commands referring to a
+    symbol that is not known yet are emitted with a zero address and recorded
+    in a fixup table, which is patched once the whole input has been read.
+    Symbols that are still unknown at that point are variables, and are
+    allocated from RAM[16] onwards in order of first use. Addresses are
+    truncated to the 15 bits of an A-instruction.
 
     Args:
         input_file (typing.TextIO): the file to assemble.
-        output_file (typing.TextIO): writes all output to this file.
+        profile (AssemblyProfile): if given, the time of every phase and
+            counters describing the program are recorded in it.
+
+    Returns:
+        typing.Tuple[array, SymbolTable]: the encoded instructions, an array
+        of type "H", and the symbol table of the program.
     """
-    parser_l_seeker = Parser(input_file)
     symbols = SymbolTable()
-    line_count = 0
-    rom = 16
-    # first pass - filling the symbol table
-    while parser_l_seeker.has_more_commands():
-        cur_instruction_type = parser_l_seeker.command_type()
-        if cur_instruction_type == "L_COMMAND":
-            l_command = parser_l_seeker.symbol()
-            symbols.add_entry(l_command, line_count)
-        else:
-            line_count += 1
-        parser_l_seeker.advance()
-    # second pass - commands handle
-    input_file.seek(0)
-    parser_commands_handler = Parser(input_file)
-    while parser_commands_handler.has_more_commands():
-        cur_instruction_type = parser_commands_handler.command_type()
+    if profile is None:
+        words, fixups = encode_commands(
+            Parser.iter_commands(input_file), symbols)
+        resolve_fixups(words, fixups, symbols)
+        return words, symbols
+    c_commands = []
+    with profile.phase("label_pass"):
+        words, fixups = encode_commands(
+            Parser.iter_commands(input_file), symbols, c_commands)
+    with profile.phase("c_encoding"):
+        encode_c_commands(words, c_commands)
+    with profile.phase("symbol_resolution"):
+        variables = resolve_fixups(words, fixups, symbols)
+    profile.count("instructions", len(words))
+    profile.count("c_commands", len(c_commands))
+    profile.count("labels", symbols.size() - len(SymbolTable.PREDEFINED) -
+                  variables)
+    profile.count("fixups", len(fixups))
+    profile.count("variables", variables)
+    profile.count("symbol_table_size", symbols.size())
+    return words, symbols
+
+
+def encode_commands(commands: typing.Iterable[Command],
+                    symbols: SymbolTable,
+                    c_commands: typing.Optional[list] = None) \
+        -> typing.Tuple[array, list]:
+    """Encodes every command and binds the labels.
+
+    Args:
+        commands (typing.Iterable[Command]): the commands to encode.
+        symbols (SymbolTable): labels are added to this table.
+        c_commands (list): if given, C-commands are not encoded: they are
+            emitted as zeros and their (instruction index, text) pairs are
+            appended to this list, to be encoded by encode_c_commands.
+
+    Returns:
+        typing.Tuple[array, list]: the encoded instructions, and the fixup
+        table of the A-commands whose symbol was not known when they were
+        encoded.
+    """
+    words = array("H")
+    fixups = []
+    append = words.append
+    c_instruction = Code.c_instruction
+    defer = None if c_commands is None else c_commands.append
+    for command in commands:
+        cur_instruction_type = command.type
         # handle @xxx can be @123 or @counter
         if cur_instruction_type == "A_COMMAND":
-            command = "0"
-            cur_symbol = parser_commands_handler.symbol()
-            # @counter
-            if not cur_symbol.isnumeric():
-                if symbols.contains(cur_symbol):
-                    address = symbols.get_address(cur_symbol)
-                    command += deci_to_bin(address)
-                else:
-                    symbols.add_entry(cur_symbol, rom)
-                    command += deci_to_bin(rom)
-                    rom += 1
             # @1234
+            if command.address is not None:
+                append(command.address & 0x7FFF)
+            # @counter which is already known
+            elif symbols.contains(command.symbol):
+                append(symbols.get_address(command.symbol) & 0x7FFF)
+            # @counter which is a forward label or a variable
             else:
-                command += deci_to_bin(cur_symbol)
+                fixups.append((len(words), command.symbol))
+                append(0)
         elif cur_instruction_type == "C_COMMAND":
-            comp = Code.comp(parser_commands_handler.comp())
-            dest = Code.dest(parser_commands_handler.dest())
-            jmp = Code.jump(parser_commands_handler.jump())
-            if len(comp) > 7:  # shift is called
-                command = comp + dest + jmp
+            if defer is None:
+                append(c_instruction(command.text))
             else:
-                command = "111" + comp + dest + jmp
+                defer((len(words), command.text))
+                append(0)
+        # handle (xxx) - binds the label to the next instruction address
+        else:
+            symbols.add_entry(command.symbol, len(words))
+    return words, fixups
+
+
+def encode_c_commands(words: array, c_commands: list) -> None:
+    """Encodes the C-commands that encode_commands deferred, so that their
+    encoding can be timed as a whole rather than one command at a time.
+
+    Args:
+        words (array): the encoded instructions.
+        c_commands (list): (instruction index, text) pairs.
+    """
+    c_instruction = Code.c_instruction
+    for index, text in c_commands:
+        words[index] = c_instruction(text)
+
+
+def assemble_file(
+        input_file: typing.TextIO, output_file: typing.IO,
+        binary: bool = False,
+        incremental: typing.Optional[IncrementalAssembler] = None,
+        profile: typing.Optional[AssemblyProfile] = None) -> None:
+    """Assembles a single file.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        output_file (typing.IO): writes all output to this file. Must be
+            opened in binary mode if binary is True.
+        binary (bool): if this is True, a packed .hackb image is written
+            instead of .hack text.
+        incremental (IncrementalAssembler): if given, the file is assembled
+            through it, re-encoding only what changed since its last run.
+        profile (AssemblyProfile): if given, the time of every phase and
+            counters describing the program are recorded in it.
+    """
+    if incremental is None:
+        words, symbols = assemble(input_file, profile)
+    elif profile is None:
+        words, symbols = incremental.assemble(input_file)
+    else:
+        with profile.phase("incremental"):
+            words, symbols = incremental.assemble(input_file)
+        profile.count("instructions", len(words))
+        profile.count("incremental_encoded", incremental.stats["encoded"])
+        profile.count("symbol_table_size", symbols.size())
+    with profile.phase("write") if profile else contextlib.nullcontext():
+        if binary:
+            symbol_count = symbols.size() - len(SymbolTable.PREDEFINED)
+            HackBinary.write(words, symbol_count, output_file)
         else:
-            parser_commands_handler.advance()
-            continue
-        output_file.write(command + '\n')
-        parser_commands_handler.advance()
+            write_words(words, output_file)
+
+
+def resolve_fixups(words: array, fixups: list, symbols: SymbolTable) -> int:
+    """Patches the addresses of forward references.
+
+    Args:
+        words (array): the encoded instructions.
+        fixups (list): (instruction index, symbol) pairs, in program order.
+        symbols (SymbolTable): holds every label of the program.
+
+    Returns:
+        int: the number of variables that were allocated.
+    """
+    rom = 16
+    for index, cur_symbol in fixups:
+        if not symbols.contains(cur_symbol):
+            symbols.add_entry(cur_symbol, rom)
+            rom += 1
+        words[index] = symbols.get_address(cur_symbol) & 0x7FFF
+    return rom - 16
+
+
+def write_words(words: array, output_file: typing.TextIO) -> None:
+    """Writes encoded instructions as lines of 16 binary digits.
+
+    Args:
+        words (array): the encoded instructions.
+        output_file (typing.TextIO): writes all output to this file.
+    """
+    byte_to_bin = BYTE_TO_BIN
+    for start in range(0, len(words), WRITE_CHUNK):
+        output_file.write("".join([
+            byte_to_bin[word >> 8] + byte_to_bin[word & 0xFF] + "\n"
+            for word in words[start:start + WRITE_CHUNK]]))
+
+
+def assemble_path(input_path: str, binary: bool = False,
+                  cache: typing.Optional[BuildCache] = None,
+                  incremental: bool = False, profile: bool = False) \
+        -> typing.Tuple[str, typing.Optional[AssemblyProfile]]:
+    """Assembles the file at the given path next to it.
+
+    Args:
+        input_path (str): the path of the .asm file.
+        binary (bool): if this is True, a .hackb image is written instead of
+            a .hack file.
+        cache (BuildCache): if given, the output is taken from this cache
+            when the same source was already assembled, and stored in it
+            otherwise.
+        incremental (bool): if this is True, the state of the run is kept
+            next to the output file (with a ".state" suffix), so that the
+            next run only re-encodes the edited commands.
+        profile (bool): if this is True, the assembly is profiled.
+
+    Returns:
+        typing.Tuple[str, typing.Optional[AssemblyProfile]]: the path of the
+        output file, and its profile if one was requested.
+    """
+    filename, extension = os.path.splitext(input_path)
+    assembly_profile = AssemblyProfile() if profile else None
+    if binary:
+        output_path, output_mode = filename + ".hackb", 'wb'
+    else:
+        output_path, output_mode = filename + ".hack", 'w'
+    if cache is not None:
+        with open(input_path, 'rb') as input_file:
+            key = cache.key(input_file.read(), binary)
+        if cache.get(key, output_path):
+            if assembly_profile is not None:
+                assembly_profile.count("cache_hits")
+            return output_path, assembly_profile
+    incremental_assembler = None
+    if incremental:
+        incremental_assembler = IncrementalAssembler(output_path + ".state")
+    with open(input_path, 'r') as input_file, \
+            open(output_path, output_mode) as output_file:
+        assemble_file(input_file, output_file, binary, incremental_assembler,
+                      assembly_profile)
+    if incremental_assembler is not None:
+        incremental_assembler.save()
+    if cache is not None:
+        cache.put(key, output_path)
+    return output_path, assembly_profile
+
+
+def assemble_paths(input_paths: typing.List[str], binary: bool = False,
+                   jobs: int = 1, cache: typing.Optional[BuildCache] = None,
+                   incremental: bool = False,
+                   profiles: typing.Optional[
+                       typing.Dict[str, AssemblyProfile]] = None
+                   ) -> typing.List[typing.Tuple[str, str]]:
+    """Assembles several independent files, possibly in parallel.
+
+    A failure in one file does not stop the others from being assembled.
+
+    Args:
+        input_paths (typing.List[str]): the paths of the .asm files.
+        binary (bool): if this is True, .hackb images are written.
+        jobs (int): the number of worker processes. 1 assembles the files
+            one after the other in this process.
+        cache (BuildCache): if given, outputs are reused from and stored in
+            this cache. Entries are evicted once all files were assembled.
+        incremental (bool): see assemble_path.
+        profiles (typing.Dict[str, AssemblyProfile]): if given, every file
+            is profiled, and its profile is stored here under its path.
+
+    Returns:
+        typing.List[typing.Tuple[str, str]]: (input path, error message) for
+        every file that failed, in the order of input_paths.
+    """
+    errors = []
+    profile = profiles is not None
+    if jobs == 1 or len(input_paths) < 2:
+        for input_path in input_paths:
+            try:
+                _, assembly_profile = assemble_path(
+                    input_path, binary, cache, incremental, profile)
+            except Exception as error:
+                errors.append((input_path, repr(error)))
+                continue
+            if profile:
+                profiles[input_path] = assembly_profile
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(assemble_path, input_path, binary, cache,
+                                incremental, profile)
+                for input_path in input_paths]
+            for input_path, future in zip(input_paths, futures):
+                error = future.exception()
+                if error is not None:
+                    errors.append((input_path, repr(error)))
+                elif profile:
+                    profiles[input_path] = future.result()[1]
+    if cache is not None:
+        cache.evict()
+    return errors
 
 
 if "__main__" == __name__:
@@ -93,20 +318,58 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: Assembler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(prog="Assembler")
+    arg_parser.add_argument("path", help="an .asm file or a directory")
+    arg_parser.add_argument(
+        "--binary", action="store_true",
+        help="write packed .hackb images instead of .hack text")
+    arg_parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="number of files to assemble in parallel (0 for one per CPU)")
+    arg_parser.add_argument(
+        "--cache-dir",
+        help="reuse outputs of unchanged sources from this directory")
+    arg_parser.add_argument(
+        "--cache-size", type=int, default=256,
+        help="size cap of the cache directory in MiB (default: 256)")
+    arg_parser.add_argument(
+        "--incremental", action="store_true",
+        help="keep the state of each run, and only re-encode the commands "
+             "that changed since the previous one")
+    arg_parser.add_argument(
+        "--profile", action="store_true",
+        help="print the time of every phase and counters of each file")
+    args = arg_parser.parse_args()
+    if args.jobs < 0:
+        arg_parser.error("--jobs must not be negative")
+    build_cache = None
+    if args.cache_dir:
+        build_cache = BuildCache(os.path.abspath(args.cache_dir),
+                                 args.cache_size * 1024 * 1024,
+                                 ASSEMBLER_VERSION)
+    argument_path = os.path.abspath(args.path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+            for filename in sorted(os.listdir(argument_path))]
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".asm":
-            continue
-        output_path = filename + ".hack"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            assemble_file(input_file, output_file)
+    files_to_assemble = [
+        input_path for input_path in files_to_assemble
+        if os.path.splitext(input_path)[1].lower() == ".asm"]
+    file_profiles = {} if args.profile else None
+    failed = assemble_paths(
+        files_to_assemble, args.binary, args.jobs or os.cpu_count(),
+        build_cache, args.incremental, file_profiles)
+    if file_profiles:
+        total_profile = AssemblyProfile()
+        for input_path, file_profile in file_profiles.items():
+            print(input_path + ":\n" + file_profile.summary())
+            total_profile.merge(file_profile)
+        if len(file_profiles) > 1:
+            print("total:\n" + total_profile.summary())
+    for input_path, message in failed:
+        print(input_path + ": " + message, file=sys.stderr)
+    if failed:
+        sys.exit("Failed to assemble " + str(len(failed)) + " of " +
+                 str(len(files_to_assemble)) + " files")
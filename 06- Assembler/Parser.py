@@ -8,6 +8,32 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 import typing
 
 
+class Command:
+    """A single command of an assembly program, as read by
+    Parser.iter_commands.
+
+    Attributes:
+        type (str): "A_COMMAND", "C_COMMAND" or "L_COMMAND".
+        text (str): the command, without white space and comments.
+        symbol (str): the symbol or decimal Xxx of @Xxx or (Xxx), None for
+            C-commands.
+        address (int): the value of @Xxx when Xxx is a decimal number, None
+            otherwise.
+    """
+    __slots__ = ("type", "text", "symbol", "address")
+
+    def __init__(self, command_type: str, text: str,
+                 symbol: typing.Optional[str] = None,
+                 address: typing.Optional[int] = None) -> None:
+        self.type = command_type
+        self.text = text
+        self.symbol = symbol
+        self.address = address
+
+    def __repr__(self) -> str:
+        return "Command(" + self.type + ", " + repr(self.text) + ")"
+
+
 class Parser:
     """Encapsulates access to the input code. Reads an assembly program
     by reading each command line-by-line, parses the current command,
@@ -20,24 +46,60 @@ class Parser:
         Args:
             input_file (typing.TextIO): input file.
         """
-        # Your code goes here!
-        # reads all the lines from the file
-        # TODO is it removing blank spaces?
-        # TODO a comment can start at the end of the command at the same line
-        input_lines = input_file.read().splitlines()
-        # remove comment lines
-        input_lines = [line for line in input_lines if not line.startswith('//')]
-        # remove blank lines
-        input_lines = [s.strip() for s in input_lines if s.strip()]
-        # remove inline comments
-        for i in range(len(input_lines)):
-            comment_index = input_lines[i].find('//')
-            if comment_index != -1:
-                input_lines[i] = input_lines[i][:comment_index].rstrip()
+        input_lines = [Parser.clean_line(line) for line in input_file]
+        # remove blank and comment lines
+        input_lines = [line for line in input_lines if line]
         self.commands = input_lines
         self.commandsNum = len(input_lines)
         self.curCommandCount = 0
-        self.curCommand = input_lines[0]
+        self.curCommand = input_lines[0] if input_lines else ""
+
+    @staticmethod
+    def clean_line(line: str) -> str:
+        """
+        Args:
+            line (str): a line of the program.
+
+        Returns:
+            str: the line without its comment and surrounding white space.
+        """
+        comment_index = line.find('//')
+        if comment_index != -1:
+            line = line[:comment_index]
+        return line.strip()
+
+    @staticmethod
+    def iter_commands(input_file: typing.Iterable[str]) \
+            -> typing.Iterator[Command]:
+        """Parses the input one line at a time.
+
+        Unlike the Parser object, which holds the whole program, this reads
+        a line only when the next command is needed, so the memory used
+        does not depend on the size of the program.
+
+        Args:
+            input_file (typing.Iterable[str]): input file, or any other
+                iterable of lines.
+
+        Returns:
+            typing.Iterator[Command]: the commands of the program, in order.
+        """
+        for line in input_file:
+            comment_index = line.find('//')
+            if comment_index != -1:
+                line = line[:comment_index]
+            line = line.strip()
+            if not line:
+                continue
+            first = line[0]
+            if first == '@':
+                symbol = line[1:]
+                yield Command("A_COMMAND", line, symbol,
+                              int(symbol) if symbol.isdecimal() else None)
+            elif first == '(':
+                yield Command("L_COMMAND", line, line[1:-1])
+            else:
+                yield Command("C_COMMAND", line)
 
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
@@ -54,6 +116,13 @@ class Parser:
         if self.has_more_commands():
             self.curCommand = self.commands[self.curCommandCount]
 
+    def command(self) -> str:
+        """
+        Returns:
+            str: the current command, without white space and comments.
+        """
+        return self.curCommand
+
     def command_type(self) -> str:
         """
         Returns:
@@ -0,0 +1,249 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import typing
+from CPUEmulator import CPUEmulator
+
+# the ROM address where a marked piece of code starts, its kind and a name
+Entry = typing.Tuple[int, str, str]
+
+
+class Profiler:
+    """Counts the instructions a translated VM program executes in each
+    function, and in each chain of calls.
+
+    The profiler reads the source map the VM translator writes with
+    --source-map, and sets a breakpoint at the entry point of every
+    function and at every return address ("resume" entries). Reaching an
+    entry point pushes the function on a call stack, and reaching a return
+    address pops it, if LCL was restored to the caller's LCL (a label right
+    after a call shares its address with the return address, and jumping to
+    it is not a return). Every instruction is counted for the call stack at
+    the time it executes, so the code of call and return sequences and of
+    the shared routines counts for the function running them. Between
+    breakpoints the emulator runs at full speed.
+
+    Instructions executed before the first function is entered count for
+    the code at the start address, the bootstrap code.
+    """
+    LCL = 1
+
+    def __init__(self, emulator: CPUEmulator,
+                 entries: typing.List[Entry]) -> None:
+        """
+        Args:
+            emulator (CPUEmulator): an emulator of the translated program.
+            entries (typing.List[Entry]): the source map of the program.
+        """
+        self.emulator = emulator
+        self.entry_points = {}
+        self.return_addresses = set()
+        root = "$$START"
+        for address, kind, name in entries:
+            if kind == "function":
+                self.entry_points[address] = name
+            elif kind == "resume":
+                self.return_addresses.add(address)
+            if address < emulator.pc and kind != "call" or \
+                    address == emulator.pc and kind == "routine":
+                root = name
+        for address in set(self.entry_points) | self.return_addresses:
+            if address < len(emulator.rom):
+                emulator.set_breakpoint(address)
+        # the called functions with the LCL of their frames
+        self.frames = [(root, None)]
+        self.stack = (root,)
+        # the number of instructions executed by every call stack
+        self.cycles = {}
+        self.calls = {}
+        self.call_edges = {}
+
+    @staticmethod
+    def read_source_map(input_file: typing.TextIO) -> typing.List[Entry]:
+        """
+        Args:
+            input_file (typing.TextIO): a .map file.
+
+        Returns:
+            typing.List[Entry]: the entries of the map.
+        """
+        entries = []
+        for line in input_file:
+            if line.strip():
+                address, kind, name = line.split()
+                entries.append((int(address), kind, name))
+        return entries
+
+    def run(self, max_steps: typing.Optional[int] = None) -> int:
+        """
+        Args:
+            max_steps (typing.Optional[int]): the largest number of
+                instructions to execute, or None to run until the program
+                halts.
+
+        Returns:
+            int: the number of instructions executed.
+        """
+        emulator = self.emulator
+        total = 0
+        while True:
+            executed = emulator.run(
+                None if max_steps is None else max_steps - total)
+            total += executed
+            self.cycles[self.stack] = self.cycles.get(self.stack, 0) + \
+                executed
+            if not emulator.at_breakpoint:
+                return total
+            self.reach(emulator.pc)
+            if max_steps is not None and total >= max_steps:
+                return total
+
+    def reach(self, address: int) -> None:
+        """Updates the call stack when a breakpoint is reached.
+
+        Args:
+            address (int): the address of the breakpoint.
+        """
+        lcl = self.emulator.ram[Profiler.LCL]
+        if address in self.return_addresses and len(self.frames) > 1 and \
+                self.frames[-2][1] == lcl:
+            self.frames.pop()
+        if address in self.entry_points:
+            callee = self.entry_points[address]
+            caller = self.frames[-1][0]
+            self.calls[callee] = self.calls.get(callee, 0) + 1
+            self.call_edges[(caller, callee)] = \
+                self.call_edges.get((caller, callee), 0) + 1
+            self.frames.append((callee, lcl))
+        self.stack = tuple(name for name, lcl in self.frames)
+
+    def self_cycles(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: the instructions executed by every
+            function itself.
+        """
+        totals = {}
+        for stack, cycles in self.cycles.items():
+            totals[stack[-1]] = totals.get(stack[-1], 0) + cycles
+        return totals
+
+    def total_cycles(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: the instructions executed by every
+            function and the functions it called. Recursive calls are only
+            counted once.
+        """
+        totals = {}
+        for stack, cycles in self.cycles.items():
+            for name in set(stack):
+                totals[name] = totals.get(name, 0) + cycles
+        return totals
+
+    def call_edge_cycles(self) -> typing.Dict[typing.Tuple[str, str], int]:
+        """
+        Returns:
+            typing.Dict[typing.Tuple[str, str], int]: the instructions
+            executed by calls of a callee from a caller, by (caller, callee).
+        """
+        totals = {}
+        for stack, cycles in self.cycles.items():
+            for edge in set(zip(stack, stack[1:])):
+                totals[edge] = totals.get(edge, 0) + cycles
+        return totals
+
+    def flat_report(self) -> str:
+        """
+        Returns:
+            str: a table of the functions, by the instructions they
+            executed themselves.
+        """
+        self_cycles = self.self_cycles()
+        total_cycles = self.total_cycles()
+        everything = max(sum(self.cycles.values()), 1)
+        lines = ["{:>12} {:>7} {:>12} {:>7} {:>9}  {}".format(
+            "self", "self%", "total", "total%", "calls", "function")]
+        for name in sorted(total_cycles, key=lambda name: (
+                -self_cycles.get(name, 0), name)):
+            lines.append("{:>12} {:>6.2f}% {:>12} {:>6.2f}% {:>9}  {}".format(
+                self_cycles.get(name, 0),
+                100 * self_cycles.get(name, 0) / everything,
+                total_cycles[name], 100 * total_cycles[name] / everything,
+                self.calls.get(name, 0), name))
+        return "\n".join(lines)
+
+    def call_graph_report(self) -> str:
+        """
+        Returns:
+            str: every function, by the instructions executed by it and its
+            callees, followed by its callers and its callees.
+        """
+        total_cycles = self.total_cycles()
+        edge_cycles = self.call_edge_cycles()
+        lines = []
+        for name in sorted(total_cycles, key=lambda name: (
+                -total_cycles[name], name)):
+            lines.append("{}: {} instructions, {} calls".format(
+                name, total_cycles[name], self.calls.get(name, 0)))
+            for (caller, callee), calls in sorted(self.call_edges.items()):
+                if callee == name:
+                    lines.append("    called by {} ({} calls)".format(
+                        caller, calls))
+            for (caller, callee), calls in sorted(self.call_edges.items()):
+                if caller == name:
+                    lines.append("    calls {} ({} calls, {} "
+                                 "instructions)".format(
+                                     callee, calls,
+                                     edge_cycles.get((caller, callee), 0)))
+        return "\n".join(lines)
+
+    def folded_stacks(self) -> typing.List[str]:
+        """
+        Returns:
+            typing.List[str]: a "caller;...;callee instructions" line for
+            every call stack, the input format of flamegraph.pl.
+        """
+        return [";".join(stack) + " " + str(cycles)
+                for stack, cycles in sorted(self.cycles.items()) if cycles]
+
+
+if "__main__" == __name__:
+    arg_parser = argparse.ArgumentParser(prog="Profiler")
+    arg_parser.add_argument(
+        "path", help="a .hack, .hackb or .asm file of a translated program")
+    arg_parser.add_argument(
+        "--map", help="the source map written by the VM translator with "
+                      "--source-map (default: the path with .map)")
+    arg_parser.add_argument(
+        "--steps", type=int,
+        help="the largest number of instructions to execute")
+    arg_parser.add_argument(
+        "--call-graph", action="store_true",
+        help="also print the callers and callees of every function")
+    arg_parser.add_argument(
+        "--folded", metavar="PATH",
+        help="write the call stacks in the folded format of flamegraph.pl")
+    args = arg_parser.parse_args()
+    program_path = os.path.abspath(args.path)
+    map_path = args.map or os.path.splitext(program_path)[0] + ".map"
+    with open(map_path, "r") as map_file:
+        source_map = Profiler.read_source_map(map_file)
+    profiler = Profiler(CPUEmulator.load(program_path), source_map)
+    executed = profiler.run(args.steps)
+    print(("halted" if profiler.emulator.halted else "stopped") + " after " +
+          str(executed) + " instructions")
+    print(profiler.flat_report())
+    if args.call_graph:
+        print()
+        print(profiler.call_graph_report())
+    if args.folded:
+        with open(args.folded, "w") as folded_file:
+            folded_file.write("".join(
+                line + "\n" for line in profiler.folded_stacks()))
@@ -0,0 +1,122 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import struct
+import typing
+import zlib
+from SymbolTable import SymbolTable
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Screen:
+    """The screen of the Hack computer, rendered from the RAM with NumPy.
+
+    The screen memory map is viewed as an array of 256 rows of 32 words,
+    which shares its memory with the RAM, so nothing is copied while the
+    program runs. Pixel (row, column) is bit column % 16 of the word
+    SCREEN + 32 * row + column / 16, and a set bit is a black pixel.
+    Rendering unpacks all the bits of the changed rows at once into an
+    image of 256x512 bytes, 1 for black and 0 for white. The words of every
+    row are remembered when it is rendered, so that the next render only
+    unpacks the rows that were written since.
+
+    NumPy is only needed by this class, and is not required by the rest of
+    the assembler.
+    """
+    BASE = SymbolTable.PREDEFINED["SCREEN"]
+    ROWS = 256
+    COLUMNS = 512
+    WORDS_PER_ROW = COLUMNS // 16
+
+    def __init__(self, ram: typing.Any) -> None:
+        """
+        Args:
+            ram: the RAM of the computer, any object with a writable buffer
+                of 16-bit words, such as the ram of a CPUEmulator.
+        """
+        if numpy is None:
+            raise ImportError("Screen requires NumPy, install it with "
+                              "'pip install numpy'")
+        self.words = numpy.frombuffer(
+            ram, dtype=numpy.uint16, count=Screen.ROWS * Screen.WORDS_PER_ROW,
+            offset=2 * Screen.BASE).reshape(Screen.ROWS, Screen.WORDS_PER_ROW)
+        self.image = numpy.zeros((Screen.ROWS, Screen.COLUMNS), numpy.uint8)
+        # the words of every row when it was last rendered, the inverse of
+        # the current words forces the first render to draw every row
+        self.rendered_words = ~self.words
+
+    def dirty_rows(self) -> "numpy.ndarray":
+        """
+        Returns:
+            numpy.ndarray: the indices of the rows that changed since they
+            were last rendered.
+        """
+        return numpy.flatnonzero(
+            (self.words != self.rendered_words).any(axis=1))
+
+    def render(self) -> "numpy.ndarray":
+        """Updates the image with the rows that changed.
+
+        Returns:
+            numpy.ndarray: the image, an array of 256x512 bytes where 1 is a
+            black pixel. The same array is updated by every call.
+        """
+        rows = self.dirty_rows()
+        if rows.size:
+            words = self.words[rows]
+            self.rendered_words[rows] = words
+            # the first pixel of a word is its least significant bit
+            self.image[rows] = numpy.unpackbits(
+                words.astype("<u2").view(numpy.uint8), axis=1,
+                bitorder="little")
+        return self.image
+
+    def write_pgm(self, path: str) -> None:
+        """Writes the screen as a binary PGM image.
+
+        Args:
+            path (str): the path of the image.
+        """
+        pixels = (1 - self.render()) * numpy.uint8(255)
+        with open(path, "wb") as output_file:
+            output_file.write(b"P5\n%d %d\n255\n" % (Screen.COLUMNS,
+                                                     Screen.ROWS))
+            output_file.write(pixels.tobytes())
+
+    def write_png(self, path: str) -> None:
+        """Writes the screen as a black and white PNG image.
+
+        Args:
+            path (str): the path of the image.
+        """
+        # every row is a filter type byte followed by the pixels, 8 per
+        # byte, where 0 is black
+        rows = numpy.packbits(1 - self.render(), axis=1)
+        data = numpy.hstack(
+            (numpy.zeros((Screen.ROWS, 1), numpy.uint8), rows)).tobytes()
+        with open(path, "wb") as output_file:
+            output_file.write(b"\x89PNG\r\n\x1a\n")
+            Screen.write_png_chunk(output_file, b"IHDR", struct.pack(
+                ">IIBBBBB", Screen.COLUMNS, Screen.ROWS, 1, 0, 0, 0, 0))
+            Screen.write_png_chunk(output_file, b"IDAT", zlib.compress(data))
+            Screen.write_png_chunk(output_file, b"IEND", b"")
+
+    @staticmethod
+    def write_png_chunk(output_file: typing.BinaryIO, chunk_type: bytes,
+                        data: bytes) -> None:
+        """
+        Args:
+            output_file (typing.BinaryIO): the PNG file.
+            chunk_type (bytes): the four letter type of the chunk.
+            data (bytes): the contents of the chunk.
+        """
+        output_file.write(struct.pack(">I", len(data)) + chunk_type + data +
+                          struct.pack(">I", zlib.crc32(chunk_type + data)))
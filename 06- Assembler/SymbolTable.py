@@ -12,36 +12,37 @@ class SymbolTable:
     A symbol table that keeps a correspondence between symbolic labels and 
     numeric addresses.
     """
+    PREDEFINED = {"SP": 0,
+                  "LCL": 1,
+                  "ARG": 2,
+                  "THIS": 3,
+                  "THAT": 4,
+                  "R0": 0,
+                  "R1": 1,
+                  "R2": 2,
+                  "R3": 3,
+                  "R4": 4,
+                  "R5": 5,
+                  "R6": 6,
+                  "R7": 7,
+                  "R8": 8,
+                  "R9": 9,
+                  "R10": 10,
+                  "R11": 11,
+                  "R12": 12,
+                  "R13": 13,
+                  "R14": 14,
+                  "R15": 15,
+                  "SCREEN": 16384,
+                  "KBD": 24576
+                  }
 
     def __init__(self) -> None:
         """Creates a new symbol table initialized with all the predefined symbols
         and their pre-allocated RAM addresses, according to section 6.2.3 of the
         book.
         """
-        self.symbol_table = {"SP": 0,
-                             "LCL": 1,
-                             "ARG": 2,
-                             "THIS": 3,
-                             "THAT": 4,
-                             "R0": 0,
-                             "R1": 1,
-                             "R2": 2,
-                             "R3": 3,
-                             "R4": 4,
-                             "R5": 5,
-                             "R6": 6,
-                             "R7": 7,
-                             "R8": 8,
-                             "R9": 9,
-                             "R10": 10,
-                             "R11": 11,
-                             "R12": 12,
-                             "R13": 13,
-                             "R14": 14,
-                             "R15": 15,
-                             "SCREEN": 16384,
-                             "KBD": 24576
-                             }
+        self.symbol_table = dict(SymbolTable.PREDEFINED)
 
     def add_entry(self, symbol: str, address: int) -> None:
         """Adds the pair (symbol, address) to the table.
@@ -73,3 +74,10 @@ class SymbolTable:
             int: the address associated with the symbol.
         """
         return self.symbol_table[symbol]
+
+    def size(self) -> int:
+        """
+        Returns:
+            int: the number of symbols in the table, predefined ones included.
+        """
+        return len(self.symbol_table)
@@ -6,21 +6,83 @@ as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
+from LineWriter import LineWriter
 
 
 class CodeWriter:
-    """Translates VM commands into Hack assembly code."""
-    label_count = 0
-    call_count = 0
-
-    def __init__(self, output_stream: typing.TextIO) -> None:
+    """Translates VM commands into Hack assembly code.
+
+    Labels generated by a CodeWriter are numbered by its own counters, and
+    the labels of comparisons are prefixed by the file name, so files can be
+    translated by separate CodeWriters (and processes) without collisions.
+    """
+    # labels of the shared comparison routines
+    COMPARE_ROUTINES = {"eq": "$$EQ", "gt": "$$GT", "lt": "$$LT"}
+    # segments whose base address is kept in a register
+    SEGMENT_BASES = {"local": "LCL", "argument": "ARG", "this": "THIS",
+                     "that": "THAT"}
+    # the largest index of a segment above which it is cheaper to add the
+    # index to the base address in D than to increment A index times
+    NEAR_INDEX = {"C_PUSH": 3, "C_POP": 5}
+    # code generation table: (command, segment class, index class) to the
+    # method writing the cheapest code for it, see write_push_pop
+    PUSH_POP_TABLE = {
+        ("C_PUSH", "constant", "small"): "write_push_small_constant",
+        ("C_PUSH", "constant", "any"): "write_push_constant",
+        ("C_PUSH", "direct", "any"): "write_push_direct",
+        ("C_PUSH", "indirect", "near"): "write_push_near",
+        ("C_PUSH", "indirect", "far"): "write_push_far",
+        ("C_POP", "direct", "any"): "write_pop_direct",
+        ("C_POP", "indirect", "near"): "write_pop_near",
+        ("C_POP", "indirect", "far"): "write_pop_far",
+    }
+    # the computations of arithmetic commands on the stack top held in D,
+    # with the second operand of binary commands in M
+    STACK_TOP_COMPS = {"add": "D+M", "sub": "M-D", "and": "D&M", "or": "D|M",
+                       "neg": "-D", "not": "!D", "shiftLeft": "D<<",
+                       "shiftRight": "D>>"}
+    # the prefix of the comments marking the code of functions, calls and
+    # returns, see SourceMap
+    MAP_MARKER = "// $$map "
+
+    def __init__(self, output_stream: typing.Union[LineWriter, typing.TextIO],
+                 shared_compare: bool = False,
+                 shared_call: bool = False,
+                 cache_top: bool = False,
+                 source_map: bool = False) -> None:
         """Initializes the CodeWriter.
         Args:
-            output_stream (typing.TextIO): output stream.
+            output_stream (typing.Union[LineWriter, typing.TextIO]): output
+                stream, or a LineWriter to share with other writers.
+            shared_compare (bool): if True, eq, gt and lt call comparison
+                routines which the bootstrap emits once, instead of being
+                expanded in place.
+            shared_call (bool): if True, call and return jump to routines
+                which the bootstrap emits once, instead of being expanded in
+                place.
+            cache_top (bool): if True, the value on top of the stack is kept
+                in D while the following commands can use it from there,
+                instead of being stored and loaded back.
+            source_map (bool): if True, comments marking where functions,
+                calls and returns start are written, from which SourceMap
+                builds a map of ROM addresses to functions.
         """
-        self.output_stream = output_stream
+        self.output = LineWriter.wrap(output_stream)
+        self.shared_compare = shared_compare
+        self.shared_call = shared_call
+        self.cache_top = cache_top
+        self.source_map = source_map
+        # True if the top of the stack is in D and was not stored yet, SP
+        # then points to where it belongs
+        self.top_in_d = False
         self.current_function = "Sys.init"
         self.file_name = ""
+        self.label_count = 0
+        self.call_count = 0
+        # the unique part of the labels of the current comparison
+        self.label_id = ""
+        # the unique part of the return label of the current call
+        self.call_id = ""
 
     def set_file_name(self, filename: str) -> None:
         """Informs the code writer that the translation of a new VM file is 
@@ -50,6 +112,17 @@ class CodeWriter:
         Args:
             command (str): an arithmetic command.
         """
+        if command in CodeWriter.COMPARE_ROUTINES:
+            # comparisons work on operands stored in the stack
+            self.flush_top()
+            if self.shared_compare:
+                # the routine pops the operands itself
+                self.write_shared_compare(command)
+                return
+        elif self.cache_top and (self.top_in_d or command not in [
+                "neg", "not", "shiftLeft", "shiftRight"]):
+            self.write_arithmetic_on_d(command)
+            return
         if command not in ["neg", "not", "shiftLeft", "shiftRight"]:
             self.write_pop()  # pops *((@sp)-1) to D register
         self.regA_as_last_stack_member_index()
@@ -66,9 +139,9 @@ class CodeWriter:
         elif command == "not":
             self.write("M=!M")
         elif command == "shiftLeft":
-            self.write("M=<<M")
+            self.write("M=M<<")
         elif command == "shiftRight":
-            self.write("M=>>M")
+            self.write("M=M>>")
         else:  # eq, lt, gt
             self.write_compare(command)
 
@@ -85,12 +158,22 @@ class CodeWriter:
         # be translated to the assembly symbol "Xxx.i". In the subsequent
         # assembly process, the Hack assembler will allocate these symbolic
         # variables to the RAM, starting at address 16.
-        if command == "C_PUSH":
-            self.write_get_src_or_dest(segment, index, command)  # sets D reg with the right data
-            self.write_push()  # pushes to stack from D reg
-        elif command == "C_POP":
-            self.write_pop()  # sets D reg to last stack member
-            self.write_get_src_or_dest(segment, index, command)  # sets the destination to D's value
+        if segment == "constant":
+            segment_class = "constant"
+            address = None
+            index_class = "small" if -1 <= index <= 1 else "any"
+        elif segment in CodeWriter.SEGMENT_BASES:
+            segment_class = "indirect"
+            address = CodeWriter.SEGMENT_BASES[segment]
+            index_class = "near" if index <= CodeWriter.NEAR_INDEX[command] \
+                else "far"
+        else:  # static, temp, pointer, inline
+            segment_class = "direct"
+            address = self.direct_address(segment, index)
+            index_class = "any"
+        write_method = CodeWriter.PUSH_POP_TABLE[
+            (command, segment_class, index_class)]
+        getattr(self, write_method)(address, index)
 
     def write_label(self, label: str) -> None:
         """Writes assembly code that affects the label command. 
@@ -104,6 +187,7 @@ class CodeWriter:
             label (str): the label to write.
         """
         # TODO:: filename.function (should i do a global var with current_scope?)
+        self.flush_top()
         self.write_pretty_function_label(label, None)
 
     def write_goto(self, label: str) -> None:
@@ -112,6 +196,7 @@ class CodeWriter:
         Args:
             label (str): the label to go to.
         """
+        self.flush_top()
         self.regA_as_function_label(label, None)
         self.write("0;JMP")
 
@@ -121,7 +206,7 @@ class CodeWriter:
         Args:
             label (str): the label to go to.
         """
-        self.write_pop()  # Pops from stack to D
+        self.pop_to_d()  # Pops from stack to D
         self.regA_as_label(self.current_function + "$" + label, None)
         # jumps if d is not 0
         self.write("D;JNE")  # false is 0 true is anything but 0
@@ -141,6 +226,8 @@ class CodeWriter:
         # The pseudo-code of "function function_name n_vars" is:
         # (function_name)       // injects a function entry label into the code
         # Updates the current function name
+        self.flush_top()
+        self.write_map_marker("function", function_name)
         self.write_pretty_label(function_name, None)
         self.current_function = function_name
         # repeat n_vars times:  // n_vars = number of local variables
@@ -164,10 +251,16 @@ class CodeWriter:
             function_name (str): the name of the function to call.
             n_args (int): the number of arguments of the function.
         """
+        self.flush_top()
+        self.write_map_marker("call", function_name)
+        if self.shared_call:
+            self.write_shared_call(function_name, n_args)
+            self.write_map_marker("resume", self.current_function)
+            return
         # The pseudo-code of "call function_name n_args" is:
         # push return_address   // generates a label and pushes it to the stack
-        CodeWriter.call_count += 1
-        self.regA_as_function_label("ret", CodeWriter.call_count)
+        self.new_call_id()
+        self.regA_as_function_label("ret", self.call_id)
         self.write("D=A")
         self.write_push()
         # push LCL              // saves LCL of the caller
@@ -195,10 +288,18 @@ class CodeWriter:
         self.write("@" + function_name)
         self.write("0;JMP")
         # (return_address)      // injects the return address label into the code
-        self.write_pretty_function_label("ret", CodeWriter.call_count)
+        self.write_pretty_function_label("ret", self.call_id)
+        self.write_map_marker("resume", self.current_function)
 
     def write_return(self) -> None:
         """Writes assembly code that affects the return command."""
+        # with no arguments, the return value goes where the return address
+        # is, so it is stored only after the return address was read
+        self.flush_top()
+        self.write_map_marker("return", self.current_function)
+        if self.shared_call:
+            self.jump_to("$$RETURN", None)
+            return
         # frame = LCL                   // frame is a temporary variable
         self.write("@LCL")
         self.write("D=M")
@@ -236,11 +337,26 @@ class CodeWriter:
         pass
 
     def write_bootstrap(self):
+        # the return label of the call is named after the bootstrap, as
+        # Sys.init's own calls are numbered separately
+        self.current_function = "$$BOOTSTRAP"
+        self.write_map_marker("routine", self.current_function)
         self.write("@256")
         self.write("D=A")
         self.write("@SP")
         self.write("M=D")
         self.write_call("Sys.init", 0)
+        # Sys.init never returns, so the shared routines can follow the call
+        if self.shared_compare:
+            self.write_compare_routines()
+        if self.shared_call:
+            self.write_call_routines()
+
+    def close(self) -> None:
+        """Stores the cached stack top, if any, and writes all the output
+        collected so far. The output stream itself is left open."""
+        self.flush_top()
+        self.output.flush()
 
     ########################## END OF API ############################
     ###################### custom functions ##########################
@@ -249,21 +365,26 @@ class CodeWriter:
         writes the command in a file output stream.
         Adds \n in EOL
         """
-        self.output_stream.write(command + '\n')
+        self.output.write_line(command)
+
+    def write_map_marker(self, kind: str, name: str):
+        """Marks the start of the code of a function, call, return or
+        shared routine, if a source map was requested"""
+        if self.source_map:
+            self.write(CodeWriter.MAP_MARKER + kind + " " + name)
 
     def write_push(self):
         """Pushes to stack whatever in D"""
         self.write("@SP")
-        self.write("A=M")
+        self.write("AM=M+1")
+        self.write("A=A-1")
         self.write("M=D")
-        self.advance_sp()
 
     def write_pop(self):
         """Pops from stack to D"""
         self.write("@SP")
-        self.write("A=M-1")
+        self.write("AM=M-1")
         self.write("D=M")
-        self.retreat_sp()
 
     def advance_sp(self):
         """@sp++"""
@@ -275,52 +396,6 @@ class CodeWriter:
         self.write("@SP")
         self.write("M=M-1")
 
-    def write_get_src_or_dest(self, segment: str, index: int, command):
-        """Gets the right address from segment and index and based on command type
-        C_PUSH: sets D register with the right data to push
-        C:POP: sets the value of an address with the content of D register"""
-        segments = {"local": "LCL", "this": "THIS", "that": "THAT", "argument": "ARG"}
-        if segment == "pointer":
-            self.pointer_handler(index, command)
-            return
-        if segment == "constant":
-            if index == -1:  # for true value
-                self.write("D=-1")
-            else:
-                self.write("@" + str(index))
-                self.write("D=A")
-            return
-        if command == "C_POP":
-            self.d_to_temp()
-        self.set_destination(segment, index)
-        if command == "C_PUSH":
-            self.get_destination()
-            self.write("D=M")
-        else:
-            self.d_from_temp()
-            self.get_destination()
-            self.write("M=D")
-
-    def set_destination(self, segment: str, index: int):
-        """Makes an address called @destination==@R14 and sets it with the right address"""
-        segments = {"local": "LCL", "this": "THIS", "that": "THAT", "argument": "ARG"}
-        if segment == "static":
-            self.regA_as_label(self.file_name, index)
-            self.write("D=A")
-            self.write("@R14")
-            self.write("M=D")
-            return
-        self.write("@" + str(index))
-        self.write("D=A")
-        if segment == "temp":
-            self.write("@R5")
-            self.write("D=D+A")
-        elif segment in segments.keys():  # segment is local/this/that/arg
-            self.write("@" + segments.get(segment))
-            self.write("D=D+M")
-        self.write("@R14")
-        self.write("M=D")
-
     def field_to_prefunction_address(self, field: str, delta: int):
         """Sets a given field(ARG/THIS/THAT/LCL) with the right address from
         LCL assuming its address is at @R15. and calculating it's place with given delta"""
@@ -333,11 +408,6 @@ class CodeWriter:
         self.write("@" + field)
         self.write("M=D")
 
-    def get_destination(self):
-        """Sets A register to destination"""
-        self.write("@R14")
-        self.write("A=M")
-
     def regA_as_last_stack_member_index(self):
         """Sets A register as the address of the last stack member"""
         self.write("@SP")
@@ -345,65 +415,342 @@ class CodeWriter:
 
     def write_compare(self, command: str):
         """Manages the writing of eq gt lt"""
-        CodeWriter.label_count += 1
+        self.new_label_id()
         self.write_pre_compare(command)
-        self.write_pretty_label("unresolved", CodeWriter.label_count)  # jumps here if pre compare couldn't determine
-        # pre_compare popd x and y. to subtract successfully in case unresolved, we should add 2 to SP.
-        self.advance_sp()
-        self.advance_sp()
-        self.write_arithmetic("sub")
-        self.retreat_sp()  # arithmetic advanced
-        self.write("A=M")
-        self.write("D=M")
-        self.regA_as_label("TRUE", CodeWriter.label_count)
+        self.write_pretty_label("unresolved", self.label_id)  # jumps here if pre compare couldn't determine
+        # pre_compare popd x and y, which are still right above the stack
+        self.write("@SP")
+        self.write("A=M+1")
+        self.write("D=M")  # y
+        self.write("A=A-1")
+        self.write("D=M-D")  # x-y
+        self.regA_as_label("TRUE", self.label_id)
         if command == "eq":
             self.write("D;JEQ")
         elif command == "lt":
             self.write("D;JLT")
         elif command == "gt":
             self.write("D;JGT")
-        self.regA_as_label("FALSE", CodeWriter.label_count)
+        self.regA_as_label("FALSE", self.label_id)
         self.write("0;JMP")  # jumps over TRUE label section
-        self.write_pretty_label("TRUE", CodeWriter.label_count)
+        self.write_pretty_label("TRUE", self.label_id)
         self.write_push_true()
-        self.regA_as_label("CONTINUE", CodeWriter.label_count)
+        self.regA_as_label("CONTINUE", self.label_id)
         self.write("0;JMP")
-        self.write_pretty_label("FALSE", CodeWriter.label_count)
+        self.write_pretty_label("FALSE", self.label_id)
         self.write_push_false()
-        self.write_pretty_label("CONTINUE", CodeWriter.label_count)
+        self.write_pretty_label("CONTINUE", self.label_id)
 
-    def pointer_handler(self, index: int, command: str):
-        if index == 0:
-            self.write("@THIS")
-        else:
-            self.write("@THAT")
-        if command == "C_POP":
+    def write_shared_compare(self, command: str):
+        """Calls the shared routine of eq, gt or lt, passing the return
+        address in D"""
+        self.new_label_id()
+        self.regA_as_label("COMPARE_RETURN", self.label_id)
+        self.write("D=A")
+        self.jump_to(CodeWriter.COMPARE_ROUTINES[command], None)
+        self.write_pretty_label("COMPARE_RETURN", self.label_id)
+
+    def write_compare_routines(self):
+        """Writes the shared routines of eq, gt and lt.
+        Each routine is entered with the return address in D, pops y, replaces
+        x with the result and jumps back. gt and lt compare the signs of x and
+        y first, and only subtract if they are equal, so x-y can't overflow"""
+        self.write_map_marker("routine", "$$COMPARE")
+        # eq: x-y is 0 exactly when x==y, even if it overflows
+        self.write_pretty_label("$$EQ", None)
+        self.write_compare_prologue()
+        self.write("@SP")
+        self.write("A=M-1")
+        self.write("D=M-D")
+        self.regA_as_label("$$TRUE", None)
+        self.write("D;JEQ")
+        self.jump_to("$$FALSE", None)
+        for command, routine in (("gt", "$$GT"), ("lt", "$$LT")):
+            self.write_pretty_label(routine, None)
+            self.write_compare_prologue()
+            self.write("@R13")  # R13 holds y
             self.write("M=D")
-        if command == "C_PUSH":
+            self.regA_as_label(routine + ".YNEG", None)
+            self.write("D;JLT")
+            # y>=0, so if x<0 then x<y
+            self.write("@SP")
+            self.write("A=M-1")
+            self.write("D=M")
+            self.regA_as_label("$$FALSE" if command == "gt" else "$$TRUE",
+                               None)
+            self.write("D;JLT")
+            self.jump_to(routine + ".SUB", None)
+            self.write_pretty_label(routine + ".YNEG", None)
+            # y<0, so if x>=0 then x>y
+            self.write("@SP")
+            self.write("A=M-1")
             self.write("D=M")
+            self.regA_as_label("$$TRUE" if command == "gt" else "$$FALSE",
+                               None)
+            self.write("D;JGE")
+            # x and y have the same sign and D holds x
+            self.write_pretty_label(routine + ".SUB", None)
+            self.write("@R13")
+            self.write("D=D-M")
+            self.regA_as_label("$$TRUE", None)
+            self.write("D;JGT" if command == "gt" else "D;JLT")
+            self.jump_to("$$FALSE", None)
+        for result, value in (("$$TRUE", "-1"), ("$$FALSE", "0")):
+            self.write_pretty_label(result, None)
+            self.regA_as_last_stack_member_index()
+            self.write("M=" + value)
+            self.write("@R15")
+            self.write("A=M")
+            self.write("0;JMP")
+
+    def write_compare_prologue(self):
+        """Saves the return address from D in R15 and pops y to D"""
+        self.write("@R15")
+        self.write("M=D")
+        self.write_pop()
 
-    def write_pretty_label(self, text: str, label_num: int):
+    def write_shared_call(self, function_name: str, n_args: int):
+        """Calls function_name through the shared call routine: R13 holds the
+        function, R14 holds n_args and D holds the return address"""
+        self.new_call_id()
+        self.write("@" + str(n_args))
+        self.write("D=A")
+        self.write("@R14")
+        self.write("M=D")
+        self.write("@" + function_name)
+        self.write("D=A")
+        self.write("@R13")
+        self.write("M=D")
+        self.regA_as_function_label("ret", self.call_id)
+        self.write("D=A")
+        self.jump_to("$$CALL", None)
+        self.write_pretty_function_label("ret", self.call_id)
+
+    def write_call_routines(self):
+        """Writes the shared call and return routines, which do what the
+        expansions of write_call and write_return do"""
+        self.write_map_marker("routine", "$$CALL")
+        self.write_pretty_label("$$CALL", None)
+        # push return_address, LCL, ARG, THIS, THAT
+        self.write("@SP")
+        self.write("A=M")
+        self.write("M=D")
+        for field in ("LCL", "ARG", "THIS", "THAT"):
+            self.write("@" + field)
+            self.write("D=M")
+            self.write("@SP")
+            self.write("AM=M+1")
+            self.write("M=D")
+        # LCL = SP
+        self.write("@SP")
+        self.write("MD=M+1")
+        self.write("@LCL")
+        self.write("M=D")
+        # ARG = SP-5-n_args
+        self.write("@R14")
+        self.write("D=D-M")
+        self.write("@5")
+        self.write("D=D-A")
+        self.write("@ARG")
+        self.write("M=D")
+        # goto function_name
+        self.write("@R13")
+        self.write("A=M")
+        self.write("0;JMP")
+
+        self.write_map_marker("routine", "$$RETURN")
+        self.write_pretty_label("$$RETURN", None)
+        # frame = LCL, kept in R14
+        self.write("@LCL")
+        self.write("D=M")
+        self.write("@R14")
+        self.write("M=D")
+        # return_address = *(frame-5), kept in R15
+        self.write("@5")
+        self.write("A=D-A")
+        self.write("D=M")
+        self.write("@R15")
+        self.write("M=D")
+        # *ARG = pop(), SP = ARG+1
+        self.regA_as_last_stack_member_index()
+        self.write("D=M")
+        self.write("@ARG")
+        self.write("A=M")
+        self.write("M=D")
+        self.write("@ARG")
+        self.write("D=M+1")
+        self.write("@SP")
+        self.write("M=D")
+        # THAT, THIS, ARG, LCL = *(frame-1), ..., *(frame-4)
+        for field in ("THAT", "THIS", "ARG", "LCL"):
+            self.write("@R14")
+            self.write("AM=M-1")
+            self.write("D=M")
+            self.write("@" + field)
+            self.write("M=D")
+        # goto return_address
+        self.write("@R15")
+        self.write("A=M")
+        self.write("0;JMP")
+
+    def direct_address(self, segment: str, index: int) -> str:
+        """Returns the symbol of a word of the static, temp or pointer
+        segments, or of the inline segment. The inline segment is not part of
+        the VM language, it holds the arguments and locals of functions that
+        were inlined by VMProgram.inline_leaf_functions"""
+        if segment == "static":
+            return self.file_name + "." + str(index)
+        if segment == "inline":
+            return "$$INLINE." + str(index)
+        if segment == "temp":
+            return "R" + str(5 + index)
+        return "THAT" if index else "THIS"  # pointer
+
+    def write_push_small_constant(self, address: str, index: int):
+        """Pushes -1, 0 or 1 without going through D"""
+        if self.cache_top:
+            self.flush_top()
+            self.write("D=" + str(index))
+            self.push_d()
+        else:
+            self.write_push_small_value(index)
+
+    def write_push_constant(self, address: str, index: int):
+        self.flush_top()
+        self.write("@" + str(index))
+        self.write("D=A")
+        self.push_d()
+
+    def write_push_direct(self, address: str, index: int):
+        self.flush_top()
+        self.write("@" + address)
+        self.write("D=M")
+        self.push_d()
+
+    def write_push_near(self, address: str, index: int):
+        self.flush_top()
+        self.regA_as_segment_word(address, index)
+        self.write("D=M")
+        self.push_d()
+
+    def write_push_far(self, address: str, index: int):
+        self.flush_top()
+        self.write("@" + str(index))
+        self.write("D=A")
+        self.write("@" + address)
+        self.write("A=D+M")
+        self.write("D=M")
+        self.push_d()
+
+    def write_pop_direct(self, address: str, index: int):
+        self.pop_to_d()
+        self.write("@" + address)
+        self.write("M=D")
+
+    def write_pop_near(self, address: str, index: int):
+        self.pop_to_d()
+        self.regA_as_segment_word(address, index)
+        self.write("M=D")
+
+    def write_pop_far(self, address: str, index: int):
+        """Computes the address into R13 before popping to D"""
+        self.flush_top()
+        self.write("@" + str(index))
+        self.write("D=A")
+        self.write("@" + address)
+        self.write("D=D+M")
+        self.d_to_temp()
+        self.write_pop()
+        self.write("@R13")
+        self.write("A=M")
+        self.write("M=D")
+
+    def push_d(self):
+        """Pushes D to the stack, or keeps it in D if the stack top is
+        cached"""
+        if self.cache_top:
+            self.top_in_d = True
+        else:
+            self.write_push()
+
+    def pop_to_d(self):
+        """Pops from stack to D, unless the stack top is already there"""
+        if self.top_in_d:
+            self.top_in_d = False
+        else:
+            self.write_pop()
+
+    def flush_top(self):
+        """Stores the stack top if it is held in D"""
+        if self.top_in_d:
+            self.top_in_d = False
+            self.write_push()
+
+    def write_arithmetic_on_d(self, command: str):
+        """Writes an arithmetic command other than a comparison, leaving the
+        result in D as the cached stack top"""
+        if command in ["neg", "not", "shiftLeft", "shiftRight"]:
+            self.pop_to_d()
+        else:
+            self.pop_to_d()  # y
+            self.write("@SP")  # x stays in M
+            self.write("AM=M-1")
+        self.write("D=" + CodeWriter.STACK_TOP_COMPS[command])
+        self.top_in_d = True
+
+    def regA_as_segment_word(self, base: str, index: int):
+        """Sets A register to the address of word index of the segment whose
+        base address is in base, by incrementing A index times"""
+        self.write("@" + base)
+        if index == 0:
+            self.write("A=M")
+            return
+        self.write("A=M+1")
+        for i in range(index - 1):
+            self.write("A=A+1")
+
+    def new_label_id(self):
+        """Sets label_id for the labels of a new comparison"""
+        self.label_count += 1
+        self.label_id = str(self.label_count)
+        if self.file_name:
+            self.label_id = self.file_name + "." + self.label_id
+
+    def new_call_id(self):
+        """Sets call_id for the return label of a new call. Like label_id
+        it is prefixed by the file name, as every file is translated by its
+        own CodeWriter and calls outside of functions share a function name"""
+        self.call_count += 1
+        self.call_id = str(self.call_count)
+        if self.file_name:
+            self.call_id = self.file_name + "." + self.call_id
+
+    def write_pretty_label(self, text: str,
+                           label_num: typing.Union[int, str]):
         """Writes a pretty label in form of : (text.label_num)"""
         if label_num:
             self.write("(" + text + "." + str(label_num) + ")")
         else:
             self.write("(" + text + ")")
 
-    def write_pretty_function_label(self, text: str, label_num: int):
+    def write_pretty_function_label(self, text: str,
+                                    label_num: typing.Union[int, str]):
         """Writes a pretty label in form of : (function$label)"""
         if label_num:
             self.write_pretty_label(self.current_function + "$" + text, label_num)
         else:
             self.write_pretty_label(self.current_function + "$" + text, None)
 
-    def regA_as_label(self, text: str, label_num: int):
+    def regA_as_label(self, text: str,
+                      label_num: typing.Union[int, str]):
         """"Sets A register to be the label in form of : @text.label_num"""
         if label_num:
             self.write("@" + text + "." + str(label_num))
         else:
             self.write("@" + text)
 
-    def regA_as_function_label(self, text: str, label_num: int):
+    def regA_as_function_label(self, text: str,
+                               label_num: typing.Union[int, str]):
         if label_num:
             self.regA_as_label(self.current_function + "$" + text, label_num)
         else:
@@ -411,11 +758,18 @@ class CodeWriter:
 
     def write_push_true(self):
         """Pushes -1 to the stack"""
-        self.write_push_pop("C_PUSH", "constant", -1)
+        self.write_push_small_value(-1)
 
     def write_push_false(self):
         """Pushes 0 to the stack"""
-        self.write_push_pop("C_PUSH", "constant", 0)
+        self.write_push_small_value(0)
+
+    def write_push_small_value(self, value: int):
+        """Pushes -1, 0 or 1 to the stack in memory"""
+        self.write("@SP")
+        self.write("AM=M+1")
+        self.write("A=A-1")
+        self.write("M=" + str(value))
 
     def write_push_val(self, val: str):
         """Pushes val to stack"""
@@ -433,14 +787,15 @@ class CodeWriter:
         self.write("@R13")
         self.write("D=M")
 
-    def jump_to(self, text: str, label_num: int):
+    def jump_to(self, text: str,
+                label_num: typing.Union[int, str]):
         """writing a jump command to @text.label_num"""
         self.regA_as_label(text, label_num)
         self.write("0;JMP")
 
     def write_pre_compare(self, command: str):
         """Checks if we're able to determine the command output based on x and y sign """
-        cur_label = CodeWriter.label_count
+        cur_label = self.label_id
         # y is popd from stack to D
         # y=0 ?
         self.regA_as_label("yEQ0", cur_label)
@@ -451,12 +806,9 @@ class CodeWriter:
 
         # y<0
         self.write_pop()  # pops x from stack to D
-        # y<0 and x=0?
-        self.regA_as_label("yGTx", cur_label)
-        self.write("D;JEQ")
-        # y<0 and x>0 ?
+        # y<0 and x>=0 ?
         self.regA_as_label("yLTx", cur_label)
-        self.write("D;JGT")
+        self.write("D;JGE")
         # y<0 and x<0
         self.jump_to("unresolved", cur_label)
 
@@ -473,31 +825,31 @@ class CodeWriter:
         self.write("D;JGT")  # x>0
 
         # y>0
-        self.write_pretty_label("yGT0", CodeWriter.label_count)
+        self.write_pretty_label("yGT0", self.label_id)
         self.write_pop()  # pops x from stack to D
         # y>0 and x=0?
-        self.regA_as_label("yGTx", CodeWriter.label_count)
+        self.regA_as_label("yGTx", self.label_id)
         self.write("D;JEQ")
         # y>0 and x<0 ?
-        self.regA_as_label("yGTx", CodeWriter.label_count)
+        self.regA_as_label("yGTx", self.label_id)
         self.write("D;JLT")
         # y>0 and x>0
-        self.jump_to("unresolved", CodeWriter.label_count)
+        self.jump_to("unresolved", self.label_id)
 
-        self.write_pretty_label("yEQx", CodeWriter.label_count)
+        self.write_pretty_label("yEQx", self.label_id)
         if command == "eq":
-            self.jump_to("TRUE", CodeWriter.label_count)
+            self.jump_to("TRUE", self.label_id)
         else:
-            self.jump_to("FALSE", CodeWriter.label_count)
+            self.jump_to("FALSE", self.label_id)
 
-        self.write_pretty_label("yGTx", CodeWriter.label_count)
+        self.write_pretty_label("yGTx", self.label_id)
         if command == "lt":
-            self.jump_to("TRUE", CodeWriter.label_count)
+            self.jump_to("TRUE", self.label_id)
         else:
-            self.jump_to("FALSE", CodeWriter.label_count)
+            self.jump_to("FALSE", self.label_id)
 
-        self.write_pretty_label("yLTx", CodeWriter.label_count)
+        self.write_pretty_label("yLTx", self.label_id)
         if command == "gt":
-            self.jump_to("TRUE", CodeWriter.label_count)
+            self.jump_to("TRUE", self.label_id)
         else:
-            self.jump_to("FALSE", CodeWriter.label_count)
+            self.jump_to("FALSE", self.label_id)
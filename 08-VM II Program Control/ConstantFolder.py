@@ -0,0 +1,143 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from VMProgram import Command
+
+
+class ConstantFolder:
+    """Simplifies parsed VM commands before they are translated.
+
+    - "push constant a", "push constant b" and an arithmetic command (or a
+      call of Math.multiply) become a push of the result.
+    - "push constant 0" followed by add, sub or or is removed, as is the
+      negation of 0.
+    - Multiplying by a constant power of two, through "push constant 2^k"
+      and "call Math.multiply 2", becomes k shiftLeft commands. If the
+      constant is the first operand and the second one is a single push,
+      the push is moved before the shifts.
+    Negative results are pushed as their negation followed by neg, and
+    -32768 as 32767 followed by not. The rules are applied as commands are
+    added, so folded results are folded again. Labels are kept in the
+    commands, so nothing is folded across them.
+    """
+    MULTIPLY = ("C_CALL", "Math.multiply", 2)
+    # the commands computing a result from two operands
+    OPERATIONS = {
+        ("C_ARITHMETIC", "add", None): lambda x, y: x + y,
+        ("C_ARITHMETIC", "sub", None): lambda x, y: x - y,
+        ("C_ARITHMETIC", "and", None): lambda x, y: x & y,
+        ("C_ARITHMETIC", "or", None): lambda x, y: x | y,
+        ("C_ARITHMETIC", "eq", None): lambda x, y: -1 if x == y else 0,
+        ("C_ARITHMETIC", "gt", None): lambda x, y: -1 if x > y else 0,
+        ("C_ARITHMETIC", "lt", None): lambda x, y: -1 if x < y else 0,
+        MULTIPLY: lambda x, y: x * y,
+    }
+
+    @staticmethod
+    def fold(commands: typing.List[Command]) -> typing.List[Command]:
+        """
+        Args:
+            commands (typing.List[Command]): the commands of a file.
+
+        Returns:
+            typing.List[Command]: the simplified commands.
+        """
+        output = []
+        for command in commands:
+            output.append(command)
+            while ConstantFolder.fold_tail(output):
+                pass
+        return output
+
+    @staticmethod
+    def fold_tail(output: typing.List[Command]) -> bool:
+        """Applies a single rule to the last commands of output.
+
+        Args:
+            output (typing.List[Command]): the commands so far.
+
+        Returns:
+            bool: True if a rule was applied.
+        """
+        if len(output) < 2:
+            return False
+        last = output[-1]
+        operation = ConstantFolder.OPERATIONS.get(last)
+        second = ConstantFolder.constant(output[-2])
+        first = ConstantFolder.constant(output[-3]) \
+            if len(output) >= 3 else None
+        if operation is not None and first is not None and \
+                second is not None:
+            del output[-3:]
+            output.extend(ConstantFolder.push_value(operation(first, second)))
+            return True
+        if second == 0 and last[0] == "C_ARITHMETIC" and \
+                last[1] in ("add", "sub", "or", "neg"):
+            # x+0, x-0 and x|0 are x, and -0 is 0
+            del output[-1 if last[1] == "neg" else -2:]
+            return True
+        if last == ConstantFolder.MULTIPLY:
+            if ConstantFolder.power_of_two(second) is not None:
+                shifts = ConstantFolder.power_of_two(second)
+                del output[-2:]
+                output.extend([("C_ARITHMETIC", "shiftLeft", None)] * shifts)
+                return True
+            if output[-2][0] == "C_PUSH" and \
+                    ConstantFolder.power_of_two(first) is not None:
+                shifts = ConstantFolder.power_of_two(first)
+                operand = output[-2]
+                del output[-3:]
+                output.append(operand)
+                output.extend([("C_ARITHMETIC", "shiftLeft", None)] * shifts)
+                return True
+        return False
+
+    @staticmethod
+    def constant(command: Command) -> typing.Optional[int]:
+        """
+        Args:
+            command (Command): a command.
+
+        Returns:
+            typing.Optional[int]: the constant if the command pushes one,
+            None otherwise.
+        """
+        if command[0] == "C_PUSH" and command[1] == "constant":
+            return command[2]
+        return None
+
+    @staticmethod
+    def power_of_two(value: typing.Optional[int]) -> typing.Optional[int]:
+        """
+        Args:
+            value (typing.Optional[int]): a constant, or None.
+
+        Returns:
+            typing.Optional[int]: k if the constant is 2^k, None otherwise.
+        """
+        if value is None or value <= 0 or value & (value - 1):
+            return None
+        return value.bit_length() - 1
+
+    @staticmethod
+    def push_value(value: int) -> typing.List[Command]:
+        """
+        Args:
+            value (int): any integer, which is wrapped to 16 bits.
+
+        Returns:
+            typing.List[Command]: commands pushing the value.
+        """
+        value &= 0xFFFF
+        if value < 0x8000:
+            return [("C_PUSH", "constant", value)]
+        if value == 0x8000:
+            return [("C_PUSH", "constant", 0x7FFF),
+                    ("C_ARITHMETIC", "not", None)]
+        return [("C_PUSH", "constant", 0x10000 - value),
+                ("C_ARITHMETIC", "neg", None)]
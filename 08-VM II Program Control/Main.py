@@ -5,50 +5,251 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import io
 import os
-import sys
 import typing
+from concurrent.futures import ProcessPoolExecutor
 from Parser import Parser
 from CodeWriter import CodeWriter
+from ConstantFolder import ConstantFolder
+from Peephole import Peephole
+from SourceMap import SourceMap
+from VMProgram import Command, VMProgram
 
 
-def translate_file(
-        input_file: typing.TextIO, output_file: typing.TextIO,
-        bootstrap: bool) -> None:
-    """Translates a single file.
+def read_commands(input_file: typing.TextIO) -> typing.List[Command]:
+    """Parses a whole file.
 
     Args:
-        input_file (typing.TextIO): the file to translate.
-        output_file (typing.TextIO): writes all output to this file.
-        bootstrap (bool): if this is True, the current file is the 
-            first file we are translating.
+        input_file (typing.TextIO): the file to parse.
+
+    Returns:
+        typing.List[Command]: the commands of the file, in order.
     """
     parser = Parser(input_file)
-    code_writer = CodeWriter(output_file)
-    code_writer.set_file_name(os.path.splitext(os.path.basename(input_file.name))[0])
-    if bootstrap:
-        code_writer.write_bootstrap()
+    commands = []
     while parser.has_more_commands():
+        parser.advance()
         ctype = parser.command_type()
+        arg1 = parser.arg1() if ctype != "C_RETURN" else None
+        arg2 = parser.arg2() if ctype in [
+            "C_PUSH", "C_POP", "C_FUNCTION", "C_CALL"] else None
+        commands.append((ctype, arg1, arg2))
+    return commands
+
+
+def write_commands(commands: typing.List[Command],
+                   code_writer: CodeWriter) -> None:
+    """Translates parsed commands.
+
+    Args:
+        commands (typing.List[Command]): the commands to translate.
+        code_writer (CodeWriter): writes the translation.
+    """
+    for ctype, arg1, arg2 in commands:
         if ctype == "C_ARITHMETIC":
-            code_writer.write_arithmetic(parser.arg1())
+            code_writer.write_arithmetic(arg1)
         elif ctype == "C_PUSH" or ctype == "C_POP":
-            code_writer.write_push_pop(ctype, parser.arg1(), parser.arg2())
+            code_writer.write_push_pop(ctype, arg1, arg2)
         elif ctype == "C_GOTO":
-            code_writer.write_goto(parser.arg1())
+            code_writer.write_goto(arg1)
         elif ctype == "C_IF":
-            code_writer.write_if(parser.arg1())
+            code_writer.write_if(arg1)
         elif ctype == "C_LABEL":
-            code_writer.write_label(parser.arg1())
+            code_writer.write_label(arg1)
         elif ctype == "C_CALL":
-            code_writer.write_call(parser.arg1(), parser.arg2())
+            code_writer.write_call(arg1, arg2)
         elif ctype == "C_FUNCTION":
-            code_writer.write_function(parser.arg1(), parser.arg2())
+            code_writer.write_function(arg1, arg2)
         elif ctype == "C_RETURN":
             code_writer.write_return()
-        parser.advance()
+    code_writer.close()
+
+
+def translate_file(
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        bootstrap: bool, **options: bool) -> None:
+    """Translates a single file.
+
+    Args:
+        input_file (typing.TextIO): the file to translate.
+        output_file (typing.TextIO): writes all output to this file.
+        bootstrap (bool): if this is True, the current file is the 
+            first file we are translating.
+        options (bool): code generation options, passed to the CodeWriter.
+    """
+    if bootstrap:
+        bootstrap_writer = CodeWriter(output_file, **options)
+        bootstrap_writer.write_bootstrap()
+        bootstrap_writer.close()
+    code_writer = CodeWriter(output_file, **options)
+    code_writer.set_file_name(os.path.splitext(os.path.basename(input_file.name))[0])
+    write_commands(read_commands(input_file), code_writer)
+
+
+def translate_path(input_path: str, optimize: bool,
+                   options: typing.Dict[str, bool], fold: bool = False) \
+        -> str:
+    """Translates a single file in memory, so that files can be translated
+    by separate processes and merged afterwards.
+
+    Args:
+        input_path (str): the file to translate.
+        optimize (bool): if True, the translation goes through the peephole
+            optimizer.
+        options (typing.Dict[str, bool]): code generation options, passed
+            to the CodeWriter.
+        fold (bool): if True, constants are folded before translation.
+
+    Returns:
+        str: the translation of the file.
+    """
+    with open(input_path, 'r') as input_file:
+        commands = read_commands(input_file)
+    return translate_commands(file_name_of(input_path), commands, optimize,
+                              options, fold)
 
 
+def translate_commands(file_name: str, commands: typing.List[Command],
+                       optimize: bool, options: typing.Dict[str, bool],
+                       fold: bool = False) -> str:
+    """Translates the parsed commands of a single file in memory.
+
+    Args:
+        file_name (str): the name of the file, without its extension.
+        commands (typing.List[Command]): the commands to translate.
+        optimize (bool): if True, the translation goes through the peephole
+            optimizer.
+        options (typing.Dict[str, bool]): code generation options, passed
+            to the CodeWriter.
+        fold (bool): if True, constants are folded before translation.
+
+    Returns:
+        str: the translation of the commands.
+    """
+    if fold:
+        commands = ConstantFolder.fold(commands)
+    output_file = io.StringIO()
+    code_writer = CodeWriter(output_file, **options)
+    code_writer.set_file_name(file_name)
+    write_commands(commands, code_writer)
+    return finish_translation(output_file.getvalue(), optimize)
+
+
+def file_name_of(input_path: str) -> str:
+    """
+    Args:
+        input_path (str): the path of a .vm file.
+
+    Returns:
+        str: the name of the file, without its directory and extension.
+    """
+    return os.path.splitext(os.path.basename(input_path))[0]
+
+
+def read_program(input_paths: typing.List[str]) -> VMProgram:
+    """
+    Args:
+        input_paths (typing.List[str]): the files of the program.
+
+    Returns:
+        VMProgram: the parsed program.
+    """
+    program = VMProgram()
+    for input_path in input_paths:
+        with open(input_path, 'r') as input_file:
+            program.add_file(file_name_of(input_path),
+                             read_commands(input_file))
+    return program
+
+
+def translate_bootstrap(optimize: bool,
+                        options: typing.Dict[str, bool]) -> str:
+    """
+    Args:
+        optimize (bool): if True, the code goes through the peephole
+            optimizer.
+        options (typing.Dict[str, bool]): code generation options, passed
+            to the CodeWriter.
+
+    Returns:
+        str: the bootstrap code, followed by the shared routines enabled by
+        the options.
+    """
+    output_file = io.StringIO()
+    code_writer = CodeWriter(output_file, **options)
+    code_writer.write_bootstrap()
+    code_writer.close()
+    return finish_translation(output_file.getvalue(), optimize)
+
+
+def finish_translation(text: str, optimize: bool) -> str:
+    """
+    Args:
+        text (str): translated assembly code.
+        optimize (bool): if True, the code goes through the peephole
+            optimizer. The optimizer assumes nothing about the registers at
+            the start of the code, so files can be optimized separately.
+
+    Returns:
+        str: the code, optimized if requested.
+    """
+    if not optimize:
+        return text
+    lines = Peephole.optimize(text.splitlines())
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def translate_paths(input_paths: typing.List[str], output_file: typing.TextIO,
+                    optimize: bool, options: typing.Dict[str, bool],
+                    jobs: int = 1, whole_program: bool = False,
+                    inline: bool = False, fold: bool = False) -> None:
+    """Translates files into a single program, preceded by the bootstrap
+    code. The output does not depend on the number of jobs.
+
+    Args:
+        input_paths (typing.List[str]): the files to translate, in the order
+            their code should appear.
+        output_file (typing.TextIO): writes the program to this file.
+        optimize (bool): if True, the code goes through the peephole
+            optimizer.
+        options (typing.Dict[str, bool]): code generation options, passed
+            to the CodeWriter.
+        jobs (int): the number of processes translating files in parallel.
+        whole_program (bool): if True, all the files are parsed first, and
+            functions that can't be reached from Sys.init are not
+            translated.
+        inline (bool): if True, all the files are parsed first, and calls
+            of small leaf functions are replaced by the functions' commands.
+        fold (bool): if True, constant expressions are computed and
+            multiplications by powers of two become shifts before
+            translation.
+    """
+    output_file.write(translate_bootstrap(optimize, options))
+    if whole_program or inline:
+        program = read_program(input_paths)
+        if inline:
+            program.inline_leaf_functions()
+        if whole_program:
+            # after inlining, as functions may no longer be called
+            program.eliminate_dead_functions()
+        translate = translate_commands
+        arguments = [[file_name for file_name, commands in program.files],
+                     [commands for file_name, commands in program.files]]
+    else:
+        translate = translate_path
+        arguments = [input_paths]
+    count = len(arguments[0])
+    arguments += [[optimize] * count, [options] * count, [fold] * count]
+    if jobs > 1 and count > 1:
+        with ProcessPoolExecutor(min(jobs, count)) as executor:
+            for translation in executor.map(translate, *arguments):
+                output_file.write(translation)
+    else:
+        for translation in map(translate, *arguments):
+            output_file.write(translation)
+
 
 if "__main__" == __name__:
     # Parses the input path and calls translate_file on each input file.
@@ -56,25 +257,66 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(prog="VMtranslator")
+    arg_parser.add_argument("path", help="a .vm file or a directory")
+    arg_parser.add_argument(
+        "-O", "--optimize", action="store_true",
+        help="remove redundant instructions from the generated assembly")
+    arg_parser.add_argument(
+        "--shared-compare", action="store_true",
+        help="translate eq, gt and lt into calls to routines emitted once")
+    arg_parser.add_argument(
+        "--shared-call", action="store_true",
+        help="translate call and return into jumps to routines emitted once")
+    arg_parser.add_argument(
+        "--cache-top", action="store_true",
+        help="keep the top of the stack in D between commands")
+    arg_parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="number of files to translate in parallel (0 for one per CPU)")
+    arg_parser.add_argument(
+        "--whole-program", action="store_true",
+        help="parse all files first and leave out the functions that can't "
+             "be reached from Sys.init")
+    arg_parser.add_argument(
+        "--inline", action="store_true",
+        help="replace calls of small functions that call nothing with the "
+             "functions' commands")
+    arg_parser.add_argument(
+        "--fold", action="store_true",
+        help="compute constant expressions and turn multiplications by "
+             "powers of two into shifts")
+    arg_parser.add_argument(
+        "--source-map", action="store_true",
+        help="also write a .map file of the ROM addresses of every "
+             "function, call and return, for the profiler")
+    args = arg_parser.parse_args()
+    if args.jobs < 0:
+        arg_parser.error("--jobs must not be negative")
+    argument_path = os.path.abspath(args.path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+            for filename in sorted(os.listdir(argument_path))]
         output_path = os.path.join(argument_path, os.path.basename(
             argument_path))
     else:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
     output_path += ".asm"
-    bootstrap = True
+    files_to_translate = [
+        input_path for input_path in files_to_translate
+        if os.path.splitext(input_path)[1].lower() == ".vm"]
+    code_options = {"shared_compare": args.shared_compare,
+                    "shared_call": args.shared_call,
+                    "cache_top": args.cache_top,
+                    "source_map": args.source_map}
     with open(output_path, 'w') as output_file:
-        for input_path in files_to_translate:
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
-            with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file, bootstrap)
-            bootstrap = False
+        translate_paths(files_to_translate, output_file, args.optimize,
+                        code_options, args.jobs or os.cpu_count(),
+                        args.whole_program, args.inline, args.fold)
+    if args.source_map:
+        with open(output_path, 'r') as output_file, \
+                open(os.path.splitext(output_path)[0] + ".map", 'w') \
+                as map_file:
+            SourceMap.write(SourceMap.build(output_file), map_file)
@@ -65,7 +65,8 @@ class Parser:
         self.commands = input_lines
         self.commandsAmount = len(input_lines)
         self.curCommandCount = 0
-        self.curCommand = input_lines[0]
+        # there is no current command until advance is called
+        self.curCommand = ""
 
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
@@ -0,0 +1,132 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+
+class Peephole:
+    """Removes redundant instructions from the assembly the CodeWriter emits.
+
+    The templates of the CodeWriter do not know what the previous command
+    left in the registers, so the generated code often reloads A with the
+    address it already holds, loads A only to load it again, reloads D from
+    the memory word it was just copied from, or decrements SP only to
+    increment it right back. A single pass tracks, between labels, the
+    symbol held by A and the symbol of the memory word D is equal to, and:
+    - drops "@X" if A already holds X.
+    - drops "@X" if the next instruction loads A again.
+    - drops "D=M" and "M=D" if D already equals the addressed word.
+    - drops "M=M-1" followed by "M=M+1" (and the other way around).
+    A second pass replaces known sequences, such as pushing D and popping
+    it right back, with shorter ones. Both passes are repeated until nothing
+    changes. Labels are jump targets, so
+    nothing is known about the registers after them. Comment lines are kept
+    and do not affect the rules.
+    """
+    CANCELLING = {"M=M-1": "M=M+1", "M=M+1": "M=M-1"}
+    # pushing D and popping it back leaves SP and D as they were, the pushed
+    # word is still stored as the comparisons read words above the stack
+    PATTERNS = [
+        (("@SP", "AM=M+1", "A=A-1", "M=D", "@SP", "AM=M-1", "D=M"),
+         ("@SP", "A=M", "M=D")),
+    ]
+
+    @staticmethod
+    def optimize(lines: typing.List[str]) -> typing.List[str]:
+        """
+        Args:
+            lines (typing.List[str]): the assembly commands, one per line.
+
+        Returns:
+            typing.List[str]: the optimized commands.
+        """
+        while True:
+            optimized = Peephole.replace_patterns(
+                Peephole.optimize_pass(lines))
+            if len(optimized) == len(lines):
+                return optimized
+            lines = optimized
+
+    @staticmethod
+    def optimize_pass(lines: typing.List[str]) -> typing.List[str]:
+        """Applies the rules once over the commands.
+
+        Args:
+            lines (typing.List[str]): the assembly commands, one per line.
+
+        Returns:
+            typing.List[str]: the optimized commands.
+        """
+        output = []
+        # the symbol A holds, and the symbol of the word D is equal to
+        a_symbol = None
+        d_symbol = None
+        # index in output of the last instruction, None after a label
+        previous = None
+        for line in lines:
+            if not line or line.startswith("//"):
+                output.append(line)
+                continue
+            if line[0] == '(':
+                output.append(line)
+                a_symbol = d_symbol = previous = None
+                continue
+            if line[0] == '@':
+                symbol = line[1:]
+                if symbol == a_symbol:
+                    continue
+                if previous is not None and output[previous][0] == '@':
+                    output[previous] = None
+                output.append(line)
+                previous = len(output) - 1
+                a_symbol = symbol
+                continue
+            if a_symbol is not None and a_symbol == d_symbol and \
+                    line in ("D=M", "M=D"):
+                continue
+            if previous is not None and \
+                    Peephole.CANCELLING.get(output[previous]) == line:
+                output[previous] = None
+                previous = None
+                d_symbol = None
+                continue
+            output.append(line)
+            previous = len(output) - 1
+            dest, equals, comp = line.partition(';')[0].rpartition('=')
+            if 'A' in dest:
+                a_symbol = d_symbol = None
+            elif ('D' in dest and 'M' in dest) or \
+                    (dest == "D" and comp == "M") or \
+                    (dest == "M" and comp == "D"):
+                d_symbol = a_symbol
+            elif dest:
+                d_symbol = None
+        return [line for line in output if line is not None]
+
+    @staticmethod
+    def replace_patterns(lines: typing.List[str]) -> typing.List[str]:
+        """Replaces the sequences in PATTERNS with their shorter versions.
+
+        Args:
+            lines (typing.List[str]): the assembly commands, one per line.
+
+        Returns:
+            typing.List[str]: the commands after the replacements.
+        """
+        output = []
+        index = 0
+        while index < len(lines):
+            for pattern, replacement in Peephole.PATTERNS:
+                if lines[index] == pattern[0] and tuple(
+                        lines[index:index + len(pattern)]) == pattern:
+                    output.extend(replacement)
+                    index += len(pattern)
+                    break
+            else:
+                output.append(lines[index])
+                index += 1
+        return output
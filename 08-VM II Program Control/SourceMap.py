@@ -0,0 +1,63 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from CodeWriter import CodeWriter
+
+# the ROM address where a marked piece of code starts, its kind and a name
+Entry = typing.Tuple[int, str, str]
+
+
+class SourceMap:
+    """Maps the ROM addresses of a translated program to VM functions.
+
+    With the source_map option, the CodeWriter marks with a comment where
+    the code of every function, call and return starts, and where the
+    caller's code resumes after a call. The map is built from the final
+    assembly, after the peephole optimizer, by counting the instructions
+    before every marker. Its entries are, in the order of their addresses:
+    - "function F": the entry point of F.
+    - "call G": the code calling G, which is part of the function it is in.
+    - "resume F": the code of F after a call, starting at the return
+      address.
+    - "return F": the code returning from F.
+    - "routine R": the bootstrap code and the shared routines.
+    Each piece of code ends where the next entry starts.
+    """
+
+    @staticmethod
+    def build(lines: typing.Iterable[str]) -> typing.List[Entry]:
+        """
+        Args:
+            lines (typing.Iterable[str]): the lines of the translated
+                program, with the markers of the CodeWriter.
+
+        Returns:
+            typing.List[Entry]: the entries of the map.
+        """
+        entries = []
+        address = 0
+        for line in lines:
+            line = line.strip()
+            if line.startswith(CodeWriter.MAP_MARKER):
+                kind, name = line[len(CodeWriter.MAP_MARKER):].split()
+                entries.append((address, kind, name))
+            elif line and not line.startswith("//") and line[0] != '(':
+                address += 1
+        return entries
+
+    @staticmethod
+    def write(entries: typing.List[Entry], output_file: typing.TextIO) -> None:
+        """Writes the entries, one "address kind name" line each.
+
+        Args:
+            entries (typing.List[Entry]): the entries of the map.
+            output_file (typing.TextIO): the map file.
+        """
+        output_file.write("".join(
+            str(address) + " " + kind + " " + name + "\n"
+            for address, kind, name in entries))
@@ -0,0 +1,383 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import sys
+import time
+import typing
+from Main import read_program
+from VMProgram import VMProgram
+
+
+class Halt(Exception):
+    """Raised by a handler to stop the interpreter."""
+
+
+class VMInterpreter:
+    """Executes VM programs directly, without translating them.
+
+    The commands of all the files are linked once, when the program is
+    loaded: labels and functions are resolved to indices in the list of
+    commands, static variables are allocated from RAM[16] onwards in order
+    of first use (as the assembler allocates them), and every command
+    becomes a handler, a function that executes it and returns the index of
+    the next command. The RAM has the layout of the Hack computer: SP, LCL,
+    ARG, THIS and THAT in RAM[0..4], temp in RAM[5..12] and the stack from
+    RAM[256]. Values are signed 16-bit words, so add, sub, neg and shiftLeft
+    wrap around, and shiftRight keeps the sign bit. A return address is the
+    index of the command after the call.
+
+    If the program has Sys.init, it is called the way the bootstrap code
+    of the translator calls it. The program halts at a goto to itself (as
+    in "label HALT", "goto HALT"), or when it runs past its last command.
+    """
+    RAM_SIZE = 32768
+    STACK_BASE = 256
+    STATIC_BASE = 16
+    # the registers holding the base addresses of the segments
+    BASE_REGISTERS = {"local": 1, "argument": 2, "this": 3, "that": 4}
+    # the addresses of the segments that are at a fixed place
+    FIXED_SEGMENTS = {"temp": 5, "pointer": 3}
+    # the result of every arithmetic command, computed from x and y
+    ARITHMETIC = {
+        "add": ("x + y", True), "sub": ("x - y", True),
+        "and": ("x & y", False), "or": ("x | y", False),
+        "eq": ("-(x == y)", False), "gt": ("-(x > y)", False),
+        "lt": ("-(x < y)", False), "neg": ("-x", True),
+        "not": ("~x", False), "shiftLeft": ("x << 1", True),
+        "shiftRight": ("x >> 1", False),
+    }
+    UNARY = {"neg", "not", "shiftLeft", "shiftRight"}
+
+    def __init__(self, program: VMProgram,
+                 bootstrap: typing.Optional[bool] = None) -> None:
+        """
+        Args:
+            program (VMProgram): the parsed program.
+            bootstrap (typing.Optional[bool]): if this is True Sys.init is
+                called first, if it is False the program starts at its
+                first command. By default, Sys.init is called if the
+                program has it.
+        """
+        self.ram = [0] * VMInterpreter.RAM_SIZE
+        self.labels = {}
+        self.function_indices = {}
+        self.static_addresses = {}
+        self.commands = []
+        self.link(program)
+        self.code = [self.handler(index, file_name, function, command)
+                     for index, (file_name, function, command)
+                     in enumerate(self.commands)]
+        self.code.append(VMInterpreter.end_of_program)
+        self.pc = 0
+        self.halted = False
+        self.steps = 0
+        self.ram[0] = VMInterpreter.STACK_BASE
+        if bootstrap is None:
+            bootstrap = "Sys.init" in self.function_indices
+        if bootstrap:
+            # called as if by a last command, so that a return from
+            # Sys.init ends the program
+            self.pc = self.call_handler("Sys.init", 0)(len(self.commands) - 1)
+
+    @staticmethod
+    def load(path: str) -> "VMInterpreter":
+        """
+        Args:
+            path (str): a .vm file, or a directory of .vm files.
+
+        Returns:
+            VMInterpreter: an interpreter of the program.
+        """
+        if os.path.isdir(path):
+            input_paths = [os.path.join(path, filename)
+                           for filename in sorted(os.listdir(path))]
+        else:
+            input_paths = [path]
+        return VMInterpreter(read_program([
+            input_path for input_path in input_paths
+            if os.path.splitext(input_path)[1].lower() == ".vm"]))
+
+    def link(self, program: VMProgram) -> None:
+        """Collects the commands of the program, and resolves labels,
+        functions and static variables.
+
+        Args:
+            program (VMProgram): the parsed program.
+        """
+        for file_name, commands in program.files:
+            function = None
+            for command in commands:
+                ctype, arg1, arg2 = command
+                if ctype == "C_LABEL":
+                    self.labels[(function, arg1)] = len(self.commands)
+                    continue
+                if ctype == "C_FUNCTION":
+                    function = arg1
+                    self.function_indices[arg1] = len(self.commands)
+                elif arg1 == "static" and \
+                        (file_name, arg2) not in self.static_addresses:
+                    self.static_addresses[(file_name, arg2)] = \
+                        VMInterpreter.STATIC_BASE + len(self.static_addresses)
+                self.commands.append((file_name, function, command))
+
+    def run(self, max_steps: typing.Optional[int] = None) -> int:
+        """
+        Args:
+            max_steps (typing.Optional[int]): the largest number of commands
+                to execute, or None to run until the program halts.
+
+        Returns:
+            int: the number of commands executed.
+        """
+        code = self.code
+        pc = self.pc
+        limit = sys.maxsize if max_steps is None else max_steps
+        executed = 0
+        try:
+            for executed in range(limit):
+                pc = code[pc](pc)
+            else:
+                executed = limit
+        except Halt:
+            self.halted = True
+        self.pc = pc
+        self.steps += executed
+        return executed
+
+    def handler(self, index: int, file_name: str,
+                function: typing.Optional[str],
+                command: typing.Tuple) -> typing.Callable:
+        """
+        Args:
+            index (int): the index of the command.
+            file_name (str): the file the command is in.
+            function (typing.Optional[str]): the function the command is
+                in, None before the first function of the file.
+            command (typing.Tuple): the command.
+
+        Returns:
+            typing.Callable: a function executing the command, which takes
+            its index and returns the index of the next command.
+        """
+        ctype, arg1, arg2 = command
+        if ctype == "C_ARITHMETIC":
+            return self.arithmetic_handler(arg1)
+        if ctype in ("C_PUSH", "C_POP"):
+            return self.push_pop_handler(ctype, arg1, arg2, file_name)
+        if ctype in ("C_GOTO", "C_IF"):
+            if (function, arg1) not in self.labels:
+                raise ValueError("Unknown label " + arg1 + " in " +
+                                 str(function))
+            target = self.labels[(function, arg1)]
+            if ctype == "C_IF":
+                return self.if_goto_handler(target)
+            if target == index:
+                return VMInterpreter.end_of_program
+            return lambda pc: target
+        if ctype == "C_FUNCTION":
+            return self.function_handler(arg2)
+        if ctype == "C_CALL":
+            return self.call_handler(arg1, arg2)
+        return self.return_handler()
+
+    def arithmetic_handler(self, operation: str) -> typing.Callable:
+        """
+        Args:
+            operation (str): an arithmetic command.
+
+        Returns:
+            typing.Callable: a function executing the command.
+        """
+        if operation not in VMInterpreter.ARITHMETIC:
+            raise ValueError("Unknown command " + operation)
+        expression, wraps = VMInterpreter.ARITHMETIC[operation]
+        if wraps:
+            expression = "((" + expression + ") + 32768 & 65535) - 32768"
+        if operation in VMInterpreter.UNARY:
+            source = ("def handler(pc):\n"
+                      "    sp = ram[0] - 1\n"
+                      "    x = ram[sp]\n"
+                      "    ram[sp] = " + expression + "\n"
+                      "    return pc + 1\n")
+        else:
+            source = ("def handler(pc):\n"
+                      "    sp = ram[0] - 1\n"
+                      "    ram[0] = sp\n"
+                      "    x = ram[sp - 1]\n"
+                      "    y = ram[sp]\n"
+                      "    ram[sp - 1] = " + expression + "\n"
+                      "    return pc + 1\n")
+        namespace = {"ram": self.ram}
+        exec(source, namespace)
+        return namespace["handler"]
+
+    def push_pop_handler(self, ctype: str, segment: str, index: int,
+                         file_name: str) -> typing.Callable:
+        """
+        Args:
+            ctype (str): "C_PUSH" or "C_POP".
+            segment (str): the segment.
+            index (int): the index in the segment.
+            file_name (str): the file of the command, for static.
+
+        Returns:
+            typing.Callable: a function executing the command.
+        """
+        ram = self.ram
+        if segment == "constant":
+            if ctype == "C_POP":
+                raise ValueError("Can't pop into the constant segment")
+
+            def handler(pc):
+                sp = ram[0]
+                ram[sp] = index
+                ram[0] = sp + 1
+                return pc + 1
+        elif segment in VMInterpreter.BASE_REGISTERS:
+            base = VMInterpreter.BASE_REGISTERS[segment]
+            if ctype == "C_PUSH":
+                def handler(pc):
+                    sp = ram[0]
+                    ram[sp] = ram[(ram[base] + index) & 32767]
+                    ram[0] = sp + 1
+                    return pc + 1
+            else:
+                def handler(pc):
+                    sp = ram[0] - 1
+                    ram[0] = sp
+                    ram[(ram[base] + index) & 32767] = ram[sp]
+                    return pc + 1
+        else:
+            if segment == "static":
+                address = self.static_addresses[(file_name, index)]
+            elif segment in VMInterpreter.FIXED_SEGMENTS:
+                address = VMInterpreter.FIXED_SEGMENTS[segment] + index
+            else:
+                raise ValueError("Unknown segment " + segment)
+            if ctype == "C_PUSH":
+                def handler(pc):
+                    sp = ram[0]
+                    ram[sp] = ram[address]
+                    ram[0] = sp + 1
+                    return pc + 1
+            else:
+                def handler(pc):
+                    sp = ram[0] - 1
+                    ram[0] = sp
+                    ram[address] = ram[sp]
+                    return pc + 1
+        return handler
+
+    def if_goto_handler(self, target: int) -> typing.Callable:
+        """
+        Args:
+            target (int): the index of the label.
+
+        Returns:
+            typing.Callable: a function executing the command.
+        """
+        ram = self.ram
+
+        def handler(pc):
+            sp = ram[0] - 1
+            ram[0] = sp
+            return target if ram[sp] else pc + 1
+
+        return handler
+
+    def function_handler(self, n_locals: int) -> typing.Callable:
+        """
+        Args:
+            n_locals (int): the number of local variables.
+
+        Returns:
+            typing.Callable: a function executing the command.
+        """
+        ram = self.ram
+        zeros = [0] * n_locals
+
+        def handler(pc):
+            sp = ram[0]
+            ram[sp:sp + n_locals] = zeros
+            ram[0] = sp + n_locals
+            return pc + 1
+
+        return handler
+
+    def call_handler(self, function: str, n_args: int) -> typing.Callable:
+        """
+        Args:
+            function (str): the called function.
+            n_args (int): the number of arguments.
+
+        Returns:
+            typing.Callable: a function executing the command.
+        """
+        ram = self.ram
+        target = self.function_indices.get(function)
+        if target is None:
+            def handler(pc):
+                raise ValueError("Call of unknown function " + function)
+            return handler
+
+        def handler(pc):
+            sp = ram[0]
+            ram[sp] = pc + 1
+            ram[sp + 1:sp + 5] = ram[1:5]
+            ram[2] = sp - n_args
+            ram[0] = ram[1] = sp + 5
+            return target
+
+        return handler
+
+    def return_handler(self) -> typing.Callable:
+        """
+        Returns:
+            typing.Callable: a function executing the command.
+        """
+        ram = self.ram
+
+        def handler(pc):
+            frame = ram[1]
+            return_address = ram[frame - 5]
+            argument = ram[2]
+            ram[argument] = ram[ram[0] - 1]
+            ram[0] = argument + 1
+            ram[1:5] = ram[frame - 4:frame]
+            return return_address
+
+        return handler
+
+    @staticmethod
+    def end_of_program(pc: int) -> None:
+        """The handler of a goto to itself, and of the index after the
+        last command."""
+        raise Halt()
+
+
+if "__main__" == __name__:
+    arg_parser = argparse.ArgumentParser(prog="VMInterpreter")
+    arg_parser.add_argument("path", help="a .vm file or a directory")
+    arg_parser.add_argument(
+        "--steps", type=int,
+        help="the largest number of commands to execute")
+    arg_parser.add_argument(
+        "--show", nargs="*", type=int, default=[], metavar="ADDRESS",
+        help="RAM words to print after running")
+    args = arg_parser.parse_args()
+    interpreter = VMInterpreter.load(os.path.abspath(args.path))
+    start = time.perf_counter()
+    executed = interpreter.run(args.steps)
+    seconds = time.perf_counter() - start
+    print(("halted" if interpreter.halted else "stopped") + " after " +
+          str(executed) + " commands in " + format(seconds, ".3f") +
+          " s (" + format(executed / max(seconds, 1e-9), ",.0f") +
+          " commands per second)")
+    for address in args.show:
+        print("RAM[" + str(address) + "] = " + str(interpreter.ram[address]))
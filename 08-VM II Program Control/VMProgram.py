@@ -0,0 +1,274 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# a parsed VM command: its type and its arguments, None where it has none
+Command = typing.Tuple[str, typing.Optional[str], typing.Optional[int]]
+
+
+class VMProgram:
+    """The parsed commands of all the files of a program, for passes that
+    need to see the whole program at once.
+
+    The program is kept as a list of (file name, commands) pairs, in the
+    order the files are translated. The commands of a function are the
+    "function" command and every command up to the next "function" command
+    of its file.
+    """
+    ENTRY_POINT = "Sys.init"
+    # the largest number of commands of a function that is inlined
+    INLINE_MAX_COMMANDS = 16
+    # the change to the stack depth of every command an inlined function
+    # may have, and the depth it needs before it
+    STACK_EFFECTS = {
+        "add": (-1, 2), "sub": (-1, 2), "and": (-1, 2), "or": (-1, 2),
+        "eq": (-1, 2), "gt": (-1, 2), "lt": (-1, 2), "neg": (0, 1),
+        "not": (0, 1), "shiftLeft": (0, 1), "shiftRight": (0, 1),
+    }
+
+    def __init__(self) -> None:
+        self.files = []
+
+    def add_file(self, file_name: str, commands: typing.List[Command]) \
+            -> None:
+        """
+        Args:
+            file_name (str): the name of the file, without its extension.
+            commands (typing.List[Command]): the commands of the file.
+        """
+        self.files.append((file_name, commands))
+
+    def functions(self) -> typing.Dict[str, typing.List[Command]]:
+        """
+        Returns:
+            typing.Dict[str, typing.List[Command]]: the commands of every
+            function in the program, by the function's name.
+        """
+        functions = {}
+        for file_name, commands in self.files:
+            for name, body in VMProgram.split_functions(commands):
+                if name is not None:
+                    functions[name] = body
+        return functions
+
+    def call_graph(self) -> typing.Dict[str, typing.Set[str]]:
+        """
+        Returns:
+            typing.Dict[str, typing.Set[str]]: the functions called by every
+            function in the program.
+        """
+        return {name: {arg1 for ctype, arg1, arg2 in body
+                       if ctype == "C_CALL"}
+                for name, body in self.functions().items()}
+
+    def reachable_functions(self, entry_point: str = ENTRY_POINT) \
+            -> typing.Set[str]:
+        """
+        Args:
+            entry_point (str): the function the program starts from.
+
+        Returns:
+            typing.Set[str]: the functions that can be called, directly or
+            indirectly, from the entry point, including it.
+        """
+        graph = self.call_graph()
+        reachable = {entry_point}
+        pending = [entry_point]
+        while pending:
+            for callee in graph.get(pending.pop(), ()):
+                if callee not in reachable:
+                    reachable.add(callee)
+                    pending.append(callee)
+        return reachable
+
+    def eliminate_dead_functions(self, entry_point: str = ENTRY_POINT) \
+            -> typing.List[str]:
+        """Removes the functions that are never called. Programs without the
+        entry point (such as single files that are tested on their own) are
+        left as they are. Commands that precede the first function of a file
+        are always kept.
+
+        Args:
+            entry_point (str): the function the program starts from.
+
+        Returns:
+            typing.List[str]: the names of the removed functions.
+        """
+        if entry_point not in self.functions():
+            return []
+        reachable = self.reachable_functions(entry_point)
+        removed = []
+        for index, (file_name, commands) in enumerate(self.files):
+            kept = []
+            for name, body in VMProgram.split_functions(commands):
+                if name is None or name in reachable:
+                    kept.extend(body)
+                else:
+                    removed.append(name)
+            self.files[index] = (file_name, kept)
+        return removed
+
+    def inline_leaf_functions(
+            self, max_commands: int = INLINE_MAX_COMMANDS) -> int:
+        """Replaces calls to small leaf functions with the commands of the
+        function, which saves building and tearing down a frame.
+
+        A function is inlined if it has no calls, labels or jumps, returns
+        only at its end with exactly the return value on its stack, and
+        has at most max_commands commands. The arguments and locals of an
+        inlined function are kept in the "inline" segment of the
+        CodeWriter, a set of variables shared by all inlined calls, which
+        is safe as inlined code never calls anything. If the function sets
+        THIS or THAT, the caller's value is saved there as well and restored
+        after the function, like return would. Functions that use their
+        file's static segment are only inlined within that file.
+
+        Args:
+            max_commands (int): the largest number of commands, excluding
+                "function" and "return", of an inlined function.
+
+        Returns:
+            int: the number of calls that were inlined.
+        """
+        leaves = {}
+        for file_name, commands in self.files:
+            for name, body in VMProgram.split_functions(commands):
+                if name is not None and \
+                        VMProgram.is_inlinable(body, max_commands):
+                    leaves[name] = (file_name, body)
+        inlined = 0
+        for index, (file_name, commands) in enumerate(self.files):
+            output = []
+            for command in commands:
+                ctype, arg1, arg2 = command
+                leaf = leaves.get(arg1) if ctype == "C_CALL" else None
+                if leaf is not None and VMProgram.can_inline_at(
+                        leaf[1], arg2, leaf[0] == file_name):
+                    output.extend(VMProgram.inline_call(leaf[1], arg2))
+                    inlined += 1
+                else:
+                    output.append(command)
+            self.files[index] = (file_name, output)
+        return inlined
+
+    @staticmethod
+    def is_inlinable(body: typing.List[Command], max_commands: int) -> bool:
+        """
+        Args:
+            body (typing.List[Command]): the commands of a function.
+            max_commands (int): the largest number of commands of an inlined
+                function.
+
+        Returns:
+            bool: True if the function can be inlined, see
+            inline_leaf_functions.
+        """
+        if len(body) - 2 > max_commands or body[-1][0] != "C_RETURN":
+            return False
+        depth = 0
+        for ctype, arg1, arg2 in body[1:-1]:
+            if ctype == "C_PUSH":
+                depth += 1
+            elif ctype == "C_POP":
+                if depth < 1:
+                    return False
+                depth -= 1
+            elif ctype == "C_ARITHMETIC" and \
+                    arg1 in VMProgram.STACK_EFFECTS:
+                change, needed = VMProgram.STACK_EFFECTS[arg1]
+                if depth < needed:
+                    return False
+                depth += change
+            else:
+                return False
+        return depth == 1
+
+    @staticmethod
+    def can_inline_at(body: typing.List[Command], n_args: int,
+                      same_file: bool) -> bool:
+        """
+        Args:
+            body (typing.List[Command]): the commands of an inlinable
+                function.
+            n_args (int): the number of arguments of the call.
+            same_file (bool): True if the call is in the function's file.
+
+        Returns:
+            bool: True if this call of the function can be inlined.
+        """
+        for ctype, segment, index in body[1:-1]:
+            if segment == "argument" and index >= n_args:
+                return False
+            if segment == "static" and not same_file:
+                return False
+        return True
+
+    @staticmethod
+    def inline_call(body: typing.List[Command], n_args: int) \
+            -> typing.List[Command]:
+        """
+        Args:
+            body (typing.List[Command]): the commands of an inlinable
+                function.
+            n_args (int): the number of arguments of the call.
+
+        Returns:
+            typing.List[Command]: the commands replacing the call.
+        """
+        n_locals = body[0][2]
+        # the inline segment holds the arguments, the locals and then the
+        # saved THIS and THAT
+        saved = {index: n_args + n_locals + index
+                 for ctype, segment, index in body[1:-1]
+                 if ctype == "C_POP" and segment == "pointer"}
+        commands = [("C_POP", "inline", index)
+                    for index in reversed(range(n_args))]
+        for index in range(n_locals):
+            commands += [("C_PUSH", "constant", 0),
+                         ("C_POP", "inline", n_args + index)]
+        for pointer, index in sorted(saved.items()):
+            commands += [("C_PUSH", "pointer", pointer),
+                         ("C_POP", "inline", index)]
+        for ctype, segment, index in body[1:-1]:
+            if segment == "argument":
+                segment = "inline"
+            elif segment == "local":
+                segment, index = "inline", n_args + index
+            commands.append((ctype, segment, index))
+        for pointer, index in sorted(saved.items()):
+            commands += [("C_PUSH", "inline", index),
+                         ("C_POP", "pointer", pointer)]
+        return commands
+
+    @staticmethod
+    def split_functions(commands: typing.List[Command]) \
+            -> typing.List[typing.Tuple[typing.Optional[str],
+                                        typing.List[Command]]]:
+        """
+        Args:
+            commands (typing.List[Command]): the commands of a file.
+
+        Returns:
+            typing.List[typing.Tuple[typing.Optional[str],
+            typing.List[Command]]]: the name and the commands of every
+            function of the file, in order. Commands before the first
+            function are returned with None as their name.
+        """
+        functions = []
+        name = None
+        body = []
+        for command in commands:
+            if command[0] == "C_FUNCTION":
+                if body:
+                    functions.append((name, body))
+                name = command[1]
+                body = []
+            body.append(command)
+        if body:
+            functions.append((name, body))
+        return functions
@@ -10,6 +10,7 @@ import sys
 import typing
 from CompilationEngine import CompilationEngine
 from JackTokenizer import JackTokenizer
+from LineWriter import LineWriter
 from SymbolTable import SymbolTable
 from VMWriter import VMWriter
 
@@ -23,8 +24,11 @@ def compile_file(
         output_file (typing.TextIO): writes all output to this file.
     """
     tokenizer = JackTokenizer(input_file)
-    engine = CompilationEngine(tokenizer, output_file)
+    # the engine's VMWriter writes through this buffer
+    line_writer = LineWriter(output_file)
+    engine = CompilationEngine(tokenizer, line_writer)
     engine.compile_class()
+    line_writer.flush()
 
 
 if "__main__" == __name__:
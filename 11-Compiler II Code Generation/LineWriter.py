@@ -0,0 +1,76 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+
+class LineWriter:
+    """Collects output lines and writes them to a stream in large blocks.
+
+    Writers emit their output one short line at a time. Instead of
+    concatenating a newline to every line and writing it to the stream right
+    away, the lines are kept in a list and joined into a single write every
+    block_lines lines. A LineWriter can be shared by several writers, in
+    which case they should be given the LineWriter itself instead of the
+    stream. flush must be called once writing is done.
+    """
+    BLOCK_LINES = 4096
+
+    def __init__(self, output_stream: typing.TextIO,
+                 block_lines: int = BLOCK_LINES) -> None:
+        """
+        Args:
+            output_stream (typing.TextIO): the stream to write the lines to.
+            block_lines (int): the number of lines to collect before writing
+                them.
+        """
+        self.output_stream = output_stream
+        self.block_lines = block_lines
+        self.lines = []
+
+    @staticmethod
+    def wrap(output: typing.Union["LineWriter", typing.TextIO]) \
+            -> "LineWriter":
+        """
+        Args:
+            output (typing.Union[LineWriter, typing.TextIO]): a stream, or a
+                LineWriter to share.
+
+        Returns:
+            LineWriter: the given LineWriter, or a new one writing to the
+            given stream.
+        """
+        if isinstance(output, LineWriter):
+            return output
+        return LineWriter(output)
+
+    def write_line(self, line: str) -> None:
+        """
+        Args:
+            line (str): a line to write, without its newline.
+        """
+        lines = self.lines
+        lines.append(line)
+        if len(lines) >= self.block_lines:
+            self.flush()
+
+    def write(self, text: str) -> None:
+        """Writes text as is, after the lines collected so far, so that a
+        LineWriter can also be used as a stream.
+
+        Args:
+            text (str): the text to write.
+        """
+        self.flush()
+        self.output_stream.write(text)
+
+    def flush(self) -> None:
+        """Writes the lines collected so far."""
+        if self.lines:
+            self.lines.append("")
+            self.output_stream.write("\n".join(self.lines))
+            self.lines = []
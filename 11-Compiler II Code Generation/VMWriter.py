@@ -6,6 +6,7 @@ as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
+from LineWriter import LineWriter
 
 
 class VMWriter:
@@ -13,9 +14,16 @@ class VMWriter:
     Writes VM commands into a file. Encapsulates the VM command syntax.
     """
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
-        """Creates a new file and prepares it for writing VM commands."""
-        self.vm_file = output_stream
+    def __init__(self,
+                 output_stream: typing.Union[LineWriter, typing.TextIO]) \
+            -> None:
+        """Creates a new file and prepares it for writing VM commands.
+
+        Args:
+            output_stream (typing.Union[LineWriter, typing.TextIO]): output
+                stream, or a LineWriter to share with other writers.
+        """
+        self.vm_file = LineWriter.wrap(output_stream)
 
     def segment_determine(self, segment: str):
         """
@@ -40,7 +48,7 @@ class VMWriter:
             index (int): the index to push to.
         """
         segment_to_write = self.segment_determine(segment)
-        self.vm_file.write('push ' + segment_to_write + " " + str(index) + "\n")
+        self.vm_file.write_line('push ' + segment_to_write + " " + str(index))
 
     def write_pop(self, segment: str, index: int) -> None:
         """Writes a VM pop command.
@@ -55,7 +63,7 @@ class VMWriter:
             segment_to_write = 'local'
         elif segment_to_write == 'field':
             segment_to_write = 'local'
-        self.vm_file.write('pop ' + segment_to_write + " " + str(index) + "\n")
+        self.vm_file.write_line('pop ' + segment_to_write + " " + str(index))
 
     def write_arithmetic(self, command: str) -> None:
         """Writes a VM arithmetic command.
@@ -64,7 +72,7 @@ class VMWriter:
             command (str): the command to write, can be "ADD", "SUB", "NEG", 
             "EQ", "GT", "LT", "AND", "OR", "NOT", "SHIFTLEFT", "SHIFTRIGHT".
         """
-        self.vm_file.write(command + " \n")
+        self.vm_file.write_line(command + " ")
 
     def write_label(self, label: str) -> None:
         """Writes a VM label command.
@@ -72,7 +80,7 @@ class VMWriter:
         Args:
             label (str): the label to write.
         """
-        self.vm_file.write("label " + label + " \n")
+        self.vm_file.write_line("label " + label + " ")
 
     def write_goto(self, label: str) -> None:
         """Writes a VM goto command.
@@ -80,7 +88,7 @@ class VMWriter:
         Args:
             label (str): the label to go to.
         """
-        self.vm_file.write("goto " + label + " \n")
+        self.vm_file.write_line("goto " + label + " ")
 
     def write_if(self, label: str) -> None:
         """Writes a VM if-goto command.
@@ -88,7 +96,7 @@ class VMWriter:
         Args:
             label (str): the label to go to.
         """
-        self.vm_file.write("if-goto " + label + " \n")
+        self.vm_file.write_line("if-goto " + label + " ")
 
     def write_call(self, class_name: str, name: str, n_args: int) -> None:
         """Writes a VM call command.
@@ -97,7 +105,7 @@ class VMWriter:
             name (str): the name of the function to call.
             n_args (int): the number of arguments the function receives.
         """
-        self.vm_file.write("call " + class_name + "." + name + " " + str(n_args) + " \n")
+        self.vm_file.write_line("call " + class_name + "." + name + " " + str(n_args) + " ")
 
     def write_function(self, name: str, n_locals: int) -> None:
         """Writes a VM function command.
@@ -105,12 +113,17 @@ class VMWriter:
             name (str): the name of the function.
             n_locals (int): the number of local variables the function uses.
         """
-        self.vm_file.write("function " + name + " " + str(n_locals) + " \n")
+        self.vm_file.write_line("function " + name + " " + str(n_locals) + " ")
 
     def write_return(self) -> None:
         """Writes a VM return command."""
-        self.vm_file.write('return \n')
+        self.vm_file.write_line("return ")
+
+    def close(self) -> None:
+        """Writes all the commands collected so far. The output stream itself
+        is left open."""
+        self.vm_file.flush()
 
     def write(self, text):
         """Write anything in VM"""
-        self.vm_file.write(text + ' \n')
+        self.vm_file.write_line(text + " ")